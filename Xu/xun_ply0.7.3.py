@@ -1,51 +1,2508 @@
 import os
+import sys
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import random
+import subprocess
+import tempfile
+import math
+import re
+import sqlite3
 import cv2
 import tkinter as tk
 from tkinter import ttk, filedialog
 from PIL import Image, ImageTk
 import threading
+import itertools
+import queue
+import time
+import wave
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import ffmpeg
+import numpy as np
 
+try:
+    import sounddevice
+except ImportError:
+    sounddevice = None
+
+FRAME_BUFFER_CAPACITY = 8
+MAX_RENDER_WAIT_MS = 50
+PROBE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+UI_PUMP_MS = 100
+PREVIEW_SEEK_MS = 80
+PREFETCH_FRAMES = 4
+FRAME_CACHE_RAM_MB = 256
+FRAME_CACHE_SPILL_MB = 0
+LOOP_BUFFER_MB = 1024
+REVERSE_BUFFER_MB = 256
+REVERSE_CHUNK_SECONDS = 1.0
+RENDER_SURFACE_SIZES = 4
+FAST_FORWARD_FPS = 60
+SEEK_STRIDE_FRAMES = 60
+MAX_LATE_DROP_MS = 100
+LATE_RESYNC_SECONDS = 0.5
+SLOW_MOTION_FPS = 30
+MAX_INTERPOLATED_FRAMES = 7
+INTERPOLATION_OFF = "关闭"
+INTERPOLATION_BLEND = "混合"
+INTERPOLATION_FLOW = "光流"
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.avi', '.mkv', '.webm', '.wmv', '.flv', '.ts', '.mpg', '.mpeg')
+LIBRARY_POLL_SECONDS = 2.0
+THUMB_WIDTH = 160
+THUMB_HEIGHT = 90
+THUMB_INTERVAL = 5.0
+MOSAIC_OFF = "单画面"
+MOSAIC_LAYOUTS = {MOSAIC_OFF: None, "2x2": (2, 2), "3x3": (3, 3), "4x4": (4, 4)}
+MOSAIC_FPS = 30
+DECODER_OPENCV = "OpenCV"
+DECODER_FFMPEG_PIPE = "FFmpeg 管道"
+AUDIO_RATE = 48000
+AUDIO_CHANNELS = 2
+AUDIO_CHUNK_FRAMES = 1024
+AUDIO_JITTER_CHUNKS = 8
+AUDIO_RESYNC_THRESHOLD = 0.1
+AUDIO_SLEW = 0.1
+AUDIO_MIN_SPEED = 0.25
+AUDIO_MAX_SPEED = 4.0
+WSOLA_FRAME = 1024
+WSOLA_TOLERANCE = 256
+WSOLA_DECIMATION = 4
+STAGE_SAMPLES = 4096
+STAGE_HISTOGRAM_MS = (0, 1, 2, 4, 8, 16, 33, 66, 133, float('inf'))
+STATS_RECENT_SAMPLES = 120
+STATS_OVERLAY_MS = 500
+STATS_DUMP_SECONDS = 5.0
+SEEK_TIMEOUT_SECONDS = 10.0
+
+FrameInfo = namedtuple('FrameInfo', ['pts', 'frame_rate', 'serial'])
+ResizePlan = namedtuple('ResizePlan', ['size', 'shape', 'interpolation'])
+AudioChunk = namedtuple('AudioChunk', ['pcm', 'media_time', 'serial'])
+
+
+class FrameRingBuffer:
+    """
+    固定容量的帧环形缓冲区，槽位是预分配的 NumPy 数组。
+    解码线程在缓冲区写满时阻塞等待（背压），界面线程只读取已提交的槽位。
+    peek 返回代号，清空后旧代号的 release 不生效，正在读取的槽位也不会被覆盖。
+    """
+
+    def __init__(self, capacity, shape):
+        self.capacity = capacity
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.allocate(shape)
+
+    def allocate(self, shape):
+        with self.cond:
+            self.shape = shape
+            self.slots = np.empty((self.capacity,) + shape, dtype=np.uint8)
+            self.meta = [None] * self.capacity
+            self.head = 0
+            self.count = 0
+            self.reading = None
+            self.generation += 1
+            self.cond.notify_all()
+
+    def clear(self):
+        with self.cond:
+            if self.reading is not None:
+                self.head = (self.reading + 1) % self.capacity
+            self.count = 0
+            self.generation += 1
+            self.cond.notify_all()
+
+    def __len__(self):
+        return self.count
+
+    def acquire_write(self, stop_flag):
+        with self.cond:
+            while self.count == self.capacity and not stop_flag.is_set():
+                self.cond.wait(0.1)
+            if stop_flag.is_set():
+                return None, None
+            index = (self.head + self.count) % self.capacity
+            return self.slots[index], self.generation
+
+    def commit_write(self, generation, meta):
+        with self.cond:
+            if generation != self.generation or self.count == self.capacity:
+                return
+            index = (self.head + self.count) % self.capacity
+            self.meta[index] = meta
+            self.count += 1
+            self.cond.notify_all()
+
+    def peek(self):
+        with self.cond:
+            if self.count == 0:
+                return None, None, None
+            self.reading = self.head
+            return self.slots[self.head], self.meta[self.head], self.generation
+
+    def release(self, generation):
+        with self.cond:
+            self.reading = None
+            if generation != self.generation or self.count == 0:
+                return
+            self.meta[self.head] = None
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.cond.notify_all()
+
+
+def user_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'xx-player')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part.casefold() for part in re.split(r'(\d+)', name)]
+
+
+def parse_frame_rate(rate):
+    num, _, den = (rate or '0/1').partition('/')
+    den = float(den or 1)
+    return float(num) / den if den else 0.0
+
+
+class ProbeCache:
+    """
+    视频探测结果的磁盘缓存（SQLite），以 路径+大小+修改时间 为键。
+    文件未变化时直接返回缓存的元数据，不再启动 ffprobe。
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(user_cache_dir(), 'probe.sqlite')
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS probe ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, duration REAL, fps REAL, '
+            'width INTEGER, height INTEGER, codec TEXT, frame_count INTEGER)')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS keyframes (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, times BLOB)')
+        self.db.commit()
+
+    def get(self, filepath, stat=None):
+        stat = stat or os.stat(filepath)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT duration, fps, width, height, codec, frame_count FROM probe '
+                'WHERE path = ? AND size = ? AND mtime = ?',
+                (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('duration', 'fps', 'width', 'height', 'codec', 'frame_count'), row))
+
+    def put(self, filepath, info, stat=None):
+        stat = stat or os.stat(filepath)
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns, info['duration'], info['fps'],
+                 info['width'], info['height'], info['codec'], info['frame_count']))
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def probe(self, filepath):
+        stat = os.stat(filepath)
+        info = self.get(filepath, stat)
+        if info is None:
+            info = self.probe_file(filepath)
+            self.put(filepath, info, stat)
+        return info
+
+    def keyframes(self, filepath):
+        stat = os.stat(filepath)
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            row = self.db.execute('SELECT times FROM keyframes WHERE path = ? AND size = ? AND mtime = ?',
+                                  key).fetchone()
+        if row is not None:
+            return np.frombuffer(row[0], dtype=np.float64)
+
+        times = self.probe_keyframes(filepath)
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO keyframes VALUES (?, ?, ?, ?)', key + (times.tobytes(),))
+            self.db.commit()
+        return times
+
+    @staticmethod
+    def probe_keyframes(filepath):
+        probe = ffmpeg.probe(filepath, select_streams='v:0', show_entries='packet=pts_time,flags')
+        start = float(probe['streams'][0].get('start_time', 0.0)) if probe.get('streams') else 0.0
+        times = [float(packet['pts_time']) - start for packet in probe.get('packets', [])
+                 if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A')]
+        return np.array(sorted(times), dtype=np.float64)
+
+    @staticmethod
+    def probe_file(filepath):
+        probe = ffmpeg.probe(filepath)
+        duration = float(probe['format'].get('duration', 0.0))
+        stream = next((s for s in probe['streams'] if s['codec_type'] == 'video'), {})
+        fps = parse_frame_rate(stream.get('avg_frame_rate')) or parse_frame_rate(stream.get('r_frame_rate'))
+        frame_count = int(stream.get('nb_frames') or round(duration * fps))
+        return {
+            'duration': duration,
+            'fps': fps,
+            'width': int(stream.get('width', 0)),
+            'height': int(stream.get('height', 0)),
+            'codec': stream.get('codec_name', ''),
+            'frame_count': frame_count,
+        }
+
+
+class LibraryScanner:
+    """
+    媒体库扫描：用 os.scandir 递归遍历文件夹（跳过隐藏目录），扩展名不区分大小写。
+    按 (设备号, inode) 记录已进入的目录，指向上级的符号链接不会形成循环。
+    scan() 返回 {相对路径: (大小, 修改时间)}；watch() 在后台线程定期重新扫描，快照变化时回调。
+    """
+
+    def __init__(self, folder, extensions=VIDEO_EXTENSIONS, interval=LIBRARY_POLL_SECONDS):
+        self.folder = folder
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.interval = interval
+        self.snapshot = {}
+        self.stop_flag = threading.Event()
+        self.thread = None
+
+    def scan(self):
+        found = {}
+        self.walk(self.folder, found, set())
+        self.snapshot = found
+        return found
+
+    def walk(self, path, found, visited):
+        try:
+            stat = os.stat(path)
+            entries = os.scandir(path)
+        except OSError:
+            return
+        if (stat.st_dev, stat.st_ino) in visited:
+            entries.close()
+            return
+        visited.add((stat.st_dev, stat.st_ino))
+        with entries:
+            for entry in sorted(entries, key=lambda entry: entry.is_symlink()):
+                try:
+                    if entry.is_dir():
+                        if not entry.name.startswith('.'):
+                            self.walk(entry.path, found, visited)
+                    elif entry.name.lower().endswith(self.extensions):
+                        stat = entry.stat()
+                        found[os.path.relpath(entry.path, self.folder)] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+
+    def watch(self, on_change):
+        self.thread = threading.Thread(target=self.run, args=(on_change,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_flag.set()
+
+    def run(self, on_change):
+        while not self.stop_flag.wait(self.interval):
+            previous = self.snapshot
+            if self.scan() != previous:
+                on_change(self.snapshot)
+
+
+class TimelineIndex:
+    """
+    时间轴索引：保存每个文件起点的前缀和，用 bisect 把全局位置映射为 (文件索引, 文件内偏移)。
+    尚未探测完的文件时长为 0，起点相同时取最前面的文件，保证按列表顺序播放。
+    """
+
+    def __init__(self, durations):
+        self.starts = list(itertools.accumulate(durations, initial=0.0))
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    @property
+    def total(self):
+        return self.starts[-1]
+
+    def start_of(self, index):
+        return self.starts[min(index, len(self.starts) - 1)]
+
+    def locate(self, position):
+        if len(self) == 0:
+            return 0, 0.0
+        index = max(bisect.bisect_right(self.starts, position, 0, len(self)) - 1, 0)
+        if position <= self.starts[index]:
+            index = bisect.bisect_left(self.starts, self.starts[index], 0, len(self))
+        return index, max(position - self.starts[index], 0.0)
+
+
+class PresentationClock:
+    """
+    展示时钟：用单调时钟把时间轴上的位置（秒）映射为墙钟时间。
+    serial 标记一段连续的时间轴，跳转或循环后由第一帧重新锚定。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.serial = None
+        self.anchor_wall = time.monotonic()
+        self.anchor_media = 0.0
+        self.speed = 1.0
+
+    def reset(self, media_time, speed, serial):
+        with self.lock:
+            self.anchor_wall = time.monotonic()
+            self.anchor_media = media_time
+            self.speed = speed
+            self.serial = serial
+
+    def set_speed(self, speed):
+        with self.lock:
+            now = time.monotonic()
+            self.anchor_media += (now - self.anchor_wall) * self.speed
+            self.anchor_wall = now
+            self.speed = speed
+
+    def now(self):
+        with self.lock:
+            return self.anchor_media + (time.monotonic() - self.anchor_wall) * self.speed
+
+    def time_until(self, media_time):
+        return (media_time - self.now()) / self.speed
+
+    def is_late(self, media_time, frame_duration, serial):
+        if serial != self.serial:
+            return False
+        if self.speed < 0:
+            frame_duration = -frame_duration
+        return self.time_until(media_time + frame_duration) < 0
+
+    def sync(self, media_time, serial):
+        with self.lock:
+            if serial != self.serial:
+                return None
+            now = time.monotonic()
+            current = self.anchor_media + (now - self.anchor_wall) * self.speed
+            drift = media_time - current
+            self.anchor_wall = now
+            self.anchor_media = current + (drift if abs(drift) > AUDIO_RESYNC_THRESHOLD else drift * AUDIO_SLEW)
+            return drift
+
+
+class NullAudioSink:
+    """
+    空音频输出：按墙钟节奏消费 PCM 数据但不发声，用于没有声卡的环境。
+    """
+
+    def open(self, rate, channels):
+        self.rate = rate
+        self.channels = channels
+        self.chunk_duration = 0.0
+        self.reset()
+
+    def reset(self):
+        self.started = None
+        self.frames = 0
+
+    def write(self, pcm):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        wait = self.started + self.frames / self.rate - now
+        if wait > 0:
+            time.sleep(wait)
+        elif wait < -AUDIO_RESYNC_THRESHOLD:
+            self.started -= wait
+        self.frames += len(pcm)
+        self.chunk_duration = len(pcm) / self.rate
+        self.play(pcm)
+
+    def play(self, pcm):
+        pass
+
+    def delay(self):
+        return self.chunk_duration
+
+    def close(self):
+        pass
+
+
+class WavAudioSink(NullAudioSink):
+    """
+    把输出的 PCM 按墙钟节奏写入 WAV 文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.wav = None
+
+    def open(self, rate, channels):
+        super().open(rate, channels)
+        self.wav = wave.open(self.path, 'wb')
+        self.wav.setnchannels(channels)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(rate)
+
+    def play(self, pcm):
+        self.wav.writeframes(pcm.tobytes())
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+
+class DeviceAudioSink:
+    """
+    通过 sounddevice 输出到声卡，需要安装 sounddevice。
+    """
+
+    def open(self, rate, channels):
+        self.stream = sounddevice.OutputStream(samplerate=rate, channels=channels, dtype='int16')
+        self.stream.start()
+
+    def reset(self):
+        pass
+
+    def write(self, pcm):
+        self.stream.write(pcm)
+
+    def delay(self):
+        return self.stream.latency
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class TimeStretcher:
+    """
+    WSOLA 变速不变调：合成步长固定为半帧，分析步长随倍速变化，
+    在容差范围内找与上一帧自然延续最相似的位置做汉宁窗重叠相加。
+    按块流式处理，倍速可以随时改变，原速时直接透传。
+    """
+
+    def __init__(self, rate, channels, frame=WSOLA_FRAME, tolerance=WSOLA_TOLERANCE):
+        self.rate = rate
+        self.channels = channels
+        self.frame = frame
+        self.hop = frame // 2
+        self.tolerance = tolerance
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)[:, None]
+        self.reset()
+
+    def reset(self):
+        self.input = np.zeros((self.hop, self.channels), dtype=np.float32)
+        self.start_time = None
+        self.emitted = self.hop
+        self.previous = None
+        self.position = 0.0
+        self.tail = None
+
+    def process(self, pcm, media_time, speed):
+        if self.start_time is None:
+            self.start_time = media_time - self.hop / self.rate
+        self.input = np.concatenate((self.input, pcm.astype(np.float32)))
+        blocks = []
+
+        if abs(speed - 1.0) < 1e-3:
+            if self.previous is not None:
+                self.emitted = self.previous + self.hop
+                self.previous = None
+            if len(self.input) > self.emitted:
+                blocks.append((self.input[self.emitted:], self.start_time + self.emitted / self.rate))
+                self.emitted = len(self.input)
+            self.trim(self.emitted - self.hop)
+            return [(self.to_pcm(block), time) for block, time in blocks]
+
+        frame, hop, tolerance = self.frame, self.hop, self.tolerance
+        if self.previous is None:
+            if len(self.input) < self.emitted + hop:
+                return []
+            self.previous = self.emitted - hop
+            self.tail = self.input[self.emitted:self.emitted + hop] * self.window[hop:]
+            self.position = self.previous + speed * hop
+
+        while True:
+            natural = self.previous + hop
+            ideal = max(int(round(self.position)), tolerance)
+            if ideal + tolerance + frame > len(self.input) or natural + frame > len(self.input):
+                break
+            best = ideal - tolerance + WSOLA_DECIMATION * self.best_offset(natural, ideal)
+            windowed = self.input[best:best + frame] * self.window
+            blocks.append((self.tail + windowed[:hop], self.start_time + best / self.rate))
+            self.tail = windowed[hop:]
+            self.previous = best
+            self.position += speed * hop
+
+        keep = min(self.previous, int(self.position) - tolerance)
+        if keep > 0:
+            self.previous -= keep
+            self.position -= keep
+            self.trim(keep)
+        return [(self.to_pcm(block), time) for block, time in blocks]
+
+    def best_offset(self, natural, ideal):
+        step = WSOLA_DECIMATION
+        reference = self.input[natural:natural + self.frame:step].mean(axis=1)
+        candidates = self.input[ideal - self.tolerance:ideal + self.tolerance + self.frame:step].mean(axis=1)
+        return int(np.argmax(np.correlate(candidates, reference, mode='valid')))
+
+    def trim(self, count):
+        if count <= 0:
+            return
+        self.input = self.input[count:]
+        self.start_time += count / self.rate
+        self.emitted -= count
+
+    @staticmethod
+    def to_pcm(block):
+        return np.clip(block, -32768, 32767).astype(np.int16)
+
+
+class AudioEngine:
+    """
+    音频引擎：解码线程从 ffmpeg 管道读取 PCM，放进有界的抖动缓冲区；输出线程把数据交给音频输出，
+    并用已播放到的位置校正展示时钟，使视频跟随音频（音频为主时钟）。
+    没有音轨或音轨较短的文件用静音补齐到探测时长，保证时钟连续。
+    start/stop 只投递请求，由控制线程结束旧的解码线程并启动新的，调用方（界面线程）不会被阻塞。
+    """
+
+    def __init__(self, sink, clock, rate=AUDIO_RATE, channels=AUDIO_CHANNELS):
+        self.sink = sink
+        self.clock = clock
+        self.rate = rate
+        self.channels = channels
+        self.jitter = queue.Queue(maxsize=AUDIO_JITTER_CHUNKS)
+        self.serial = None
+        self.decoder_thread = None
+        self.decoder_stop = threading.Event()
+        self.requests = queue.Queue()
+        self.closed = threading.Event()
+        self.drift = deque(maxlen=200)
+        self.speed = 1.0
+        self.stretcher = TimeStretcher(rate, channels)
+        self.stretch_serial = None
+        self.sink.open(rate, channels)
+        self.output_thread = threading.Thread(target=self.output, daemon=True)
+        self.output_thread.start()
+        self.control_thread = threading.Thread(target=self.control, daemon=True)
+        self.control_thread.start()
+
+    def start(self, paths, timeline, position, serial):
+        self.serial = serial
+        self.decoder_stop.set()
+        self.requests.put((paths, timeline, position, serial))
+
+    def stop(self):
+        self.serial = None
+        self.decoder_stop.set()
+        self.requests.put(None)
+
+    def control(self):
+        while not self.closed.is_set():
+            request = self.requests.get()
+            while True:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+            self.decoder_stop.set()
+            if self.decoder_thread is not None:
+                self.decoder_thread.join()
+                self.decoder_thread = None
+            while True:
+                try:
+                    self.jitter.get_nowait()
+                except queue.Empty:
+                    break
+            self.sink.reset()
+            if request is None or request[3] != self.serial:
+                continue
+            self.decoder_stop = threading.Event()
+            self.decoder_thread = threading.Thread(target=self.decode, daemon=True,
+                                                   args=request + (self.decoder_stop,))
+            self.decoder_thread.start()
+
+    def drift_stats(self):
+        drift = np.abs(np.array(self.drift)) * 1000
+        if not len(drift):
+            return {}
+        return {'p50': float(np.percentile(drift, 50)), 'max': float(drift.max())}
+
+    def close(self):
+        self.closed.set()
+        self.stop()
+        self.control_thread.join()
+        self.output_thread.join()
+        self.sink.close()
+
+    def decode(self, paths, timeline, position, serial, stop):
+        index, offset = timeline.locate(position)
+        chunk_bytes = AUDIO_CHUNK_FRAMES * self.channels * 2
+        while index < len(paths) and not stop.is_set():
+            media_time = timeline.start_of(index) + offset
+            end = timeline.start_of(index + 1)
+            stream = ffmpeg.input(paths[index], ss=offset) if offset > 0 else ffmpeg.input(paths[index])
+            process = (
+                stream.audio
+                .output('pipe:', format='s16le', acodec='pcm_s16le', ac=self.channels, ar=self.rate,
+                        loglevel='quiet', nostdin=None)
+                .run_async(pipe_stdout=True)
+            )
+            try:
+                while not stop.is_set():
+                    data = process.stdout.read(chunk_bytes)
+                    if len(data) < self.channels * 2:
+                        break
+                    pcm = np.frombuffer(data[:len(data) - len(data) % (self.channels * 2)], dtype=np.int16)
+                    pcm = pcm.reshape(-1, self.channels)
+                    self.put(AudioChunk(pcm, media_time, serial), stop)
+                    media_time += len(pcm) / self.rate
+            finally:
+                process.stdout.close()
+                process.kill()
+                process.wait()
+
+            silence = np.zeros((AUDIO_CHUNK_FRAMES, self.channels), dtype=np.int16)
+            while end - media_time > 1 / self.rate and not stop.is_set():
+                frames = min(AUDIO_CHUNK_FRAMES, int(round((end - media_time) * self.rate)))
+                self.put(AudioChunk(silence[:frames], media_time, serial), stop)
+                media_time += frames / self.rate
+            index += 1
+            offset = 0.0
+
+    def put(self, chunk, stop):
+        while not stop.is_set():
+            try:
+                self.jitter.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def output(self):
+        while not self.closed.is_set():
+            try:
+                chunk = self.jitter.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if chunk.serial != self.serial:
+                continue
+            if chunk.serial != self.stretch_serial:
+                self.stretcher.reset()
+                self.stretch_serial = chunk.serial
+            speed = self.speed
+            for pcm, media_time in self.stretcher.process(chunk.pcm, chunk.media_time, speed):
+                self.sink.write(pcm)
+                position = media_time + (len(pcm) / self.rate - self.sink.delay()) * speed
+                drift = self.clock.sync(position, chunk.serial)
+                if drift is not None:
+                    self.drift.append(drift)
+
+
+class FFmpegPipeCapture:
+    """
+    ffmpeg 子进程解码后端：缩放和像素格式转换在 ffmpeg 内完成，原始 RGB 帧从管道直接读入 NumPy 缓冲区。
+    实现播放线程用到的 cv2.VideoCapture 接口子集，可以直接替换。retrieve() 返回的是复用的内部缓冲区。
+    """
+
+    rgb = True
+    shares_buffer = True
+
+    def __init__(self, probe_cache, output_size, filepath=None):
+        self.probe_cache = probe_cache
+        self.output_size = output_size
+        self.filepath = None
+        self.process = None
+        self.frame_rate = 0.0
+        self.start_offset = 0.0
+        self.frame_index = 0
+        if filepath is not None:
+            self.open(filepath)
+
+    def open(self, filepath):
+        self.release()
+        self.filepath = filepath
+        self.frame_rate = self.probe_cache.probe(filepath)['fps'] or 25.0
+        self.start(0.0)
+        return True
+
+    def start(self, offset):
+        self.stop_process()
+        width, height = self.output_size
+        self.buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.view = memoryview(self.buffer.reshape(-1))
+        stream = ffmpeg.input(self.filepath, ss=offset) if offset > 0 else ffmpeg.input(self.filepath)
+        self.process = (
+            stream.video
+            .filter('scale', width, height)
+            .output('pipe:', format='rawvideo', pix_fmt='rgb24', loglevel='error', nostdin=None)
+            .run_async(pipe_stdout=True)
+        )
+        self.start_offset = offset
+        self.frame_index = 0
+
+    def set_output_size(self, size):
+        if size != self.output_size and self.process is not None:
+            self.output_size = size
+            self.start(self.start_offset + self.frame_index / self.frame_rate)
+
+    def isOpened(self):
+        return self.process is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.frame_rate
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return (self.start_offset + max(self.frame_index - 1, 0) / self.frame_rate) * 1000
+        return 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_MSEC or self.filepath is None:
+            return False
+        self.start(max(value / 1000, 0.0))
+        return True
+
+    def grab(self):
+        if self.process is None:
+            return False
+        read = 0
+        while read < len(self.view):
+            count = self.process.stdout.readinto(self.view[read:])
+            if not count:
+                return False
+            read += count
+        self.frame_index += 1
+        return True
+
+    def retrieve(self):
+        return True, self.buffer
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def stop_process(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def release(self):
+        self.stop_process()
+        self.filepath = None
+
+
+class FrameInterpolator:
+    """
+    慢放插帧：在相邻两帧之间用线性混合或 Farneback 光流生成中间帧。
+    两个输出尺寸的暂存缓冲区轮换使用，整个过程在解码线程上完成。
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.previous_info = None
+
+    def allocate(self, shape):
+        self.shape = shape
+        self.previous = np.empty(shape, dtype=np.uint8)
+        self.current = np.empty(shape, dtype=np.uint8)
+        ys, xs = np.indices(shape[:2], dtype=np.float32)
+        self.grid = np.dstack((xs, ys))
+        self.previous_info = None
+
+    def reset(self):
+        self.previous_info = None
+
+    def next_buffer(self, shape):
+        if shape != self.shape:
+            self.allocate(shape)
+        self.previous, self.current = self.current, self.previous
+        return self.current
+
+    def prepare(self, mode):
+        if mode != INTERPOLATION_FLOW:
+            return
+        previous_gray = cv2.cvtColor(self.previous, cv2.COLOR_RGB2GRAY)
+        current_gray = cv2.cvtColor(self.current, cv2.COLOR_RGB2GRAY)
+        self.flow = cv2.calcOpticalFlowFarneback(previous_gray, current_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+
+    def interpolate(self, t, mode, dst):
+        if mode == INTERPOLATION_FLOW:
+            previous_map = self.grid - t * self.flow
+            current_map = self.grid + (1 - t) * self.flow
+            previous = cv2.remap(self.previous, previous_map, None, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            current = cv2.remap(self.current, current_map, None, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        else:
+            previous, current = self.previous, self.current
+        cv2.addWeighted(previous, 1 - t, current, t, 0, dst=dst)
+
+
+class Prefetcher:
+    """
+    在后台线程提前打开下一个视频并预解码前几帧，文件切换时直接接手，避免冷启动的卡顿。
+    """
+
+    def __init__(self, open_capture, preroll=PREFETCH_FRAMES):
+        self.open_capture = open_capture
+        self.preroll = preroll
+        self.filepath = None
+        self.thread = None
+        self.result = None
+
+    def start(self, filepath):
+        if self.filepath == filepath:
+            return
+        self.cancel()
+        self.filepath = filepath
+        self.thread = threading.Thread(target=self.run, args=(filepath,), daemon=True)
+        self.thread.start()
+
+    def run(self, filepath):
+        cap = self.open_capture(filepath)
+        frame_rate = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = deque()
+        while len(frames) < self.preroll and cap.grab():
+            position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frames.append((position, frame.copy() if getattr(cap, 'shares_buffer', False) else frame))
+        self.result = (cap, frame_rate, frames)
+
+    def take(self, filepath):
+        if self.filepath != filepath:
+            self.cancel()
+            return None
+        self.thread.join()
+        result = self.result
+        self.filepath = self.thread = self.result = None
+        return result
+
+    def cancel(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.result[0].release()
+        self.filepath = self.thread = self.result = None
+
+
+class MosaicTile:
+    """
+    拼接画面中的一个格子：循环播放分给它的文件，只解码到当前时间需要的那一帧，
+    缩放到格子分辨率后写入合成画布上属于自己的区域。
+    """
+
+    def __init__(self, paths, durations, view, open_capture):
+        self.paths = paths
+        self.timeline = TimelineIndex(durations)
+        self.view = view
+        self.open_capture = open_capture
+        self.image = np.empty(view.shape, dtype=np.uint8)
+        self.cap = None
+        self.index = None
+        self.frame_rate = 25.0
+        self.pts = 0.0
+
+    def seek(self, index, offset):
+        if index != self.index:
+            if self.cap is not None:
+                self.cap.release()
+            height, width = self.view.shape[:2]
+            self.cap = self.open_capture(self.paths[index], (width, height))
+            self.frame_rate = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+            self.index = index
+        if offset > 0 or self.cap.get(cv2.CAP_PROP_POS_MSEC) > 0:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, offset * 1000)
+        self.pts = offset - 1 / self.frame_rate
+
+    def advance(self, media_time):
+        total = self.timeline.total
+        index, offset = self.timeline.locate(media_time % total if total else 0.0)
+        if index != self.index or offset < self.pts:
+            self.seek(index, offset)
+        grabbed = False
+        while self.pts + 1 / self.frame_rate <= offset:
+            if not self.cap.grab():
+                break
+            self.pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            grabbed = True
+        if not grabbed:
+            return
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return
+        height, width = self.image.shape[:2]
+        rgb = getattr(self.cap, 'rgb', False)
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height), dst=self.image, interpolation=cv2.INTER_AREA)
+        if rgb:
+            np.copyto(self.view, frame)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.image)
+            np.copyto(self.view, self.image)
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class Mosaic:
+    """
+    拼接模式：播放列表按顺序轮流分给 rows×cols 个格子，各格子在线程池里并发解码，
+    结果写入一块预分配的合成画布，每个节拍整体拷贝一次交给展示。
+    """
+
+    def __init__(self, paths, durations, grid, shape, open_capture):
+        rows, cols = grid
+        count = rows * cols
+        height, width = shape[:2]
+        self.shape = shape
+        self.canvas = np.zeros(shape, dtype=np.uint8)
+        self.tiles = []
+        for cell in range(min(count, len(paths))):
+            row, col = divmod(cell, cols)
+            view = self.canvas[row * height // rows:(row + 1) * height // rows,
+                               col * width // cols:(col + 1) * width // cols]
+            self.tiles.append(MosaicTile(paths[cell::count], durations[cell::count], view, open_capture))
+        self.total = max((tile.timeline.total for tile in self.tiles), default=0.0)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, min(len(self.tiles), os.cpu_count() or 1)))
+
+    def render(self, media_time, dst):
+        for future in [self.pool.submit(tile.advance, media_time) for tile in self.tiles]:
+            future.result()
+        np.copyto(dst, self.canvas)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        for tile in self.tiles:
+            tile.close()
+
+
+class ThumbnailCache:
+    """
+    拖动预览缩略图缓存：每个文件按固定间隔取帧，缩成 RGB 小图顺序追加到该文件夹的原始精灵图文件，用 np.memmap 读取。
+    索引（每个文件的起始槽位和数量）存成 JSON，逐个文件提交，中断后下次从未完成的文件继续生成。
+    """
+
+    def __init__(self, folder, size=(THUMB_WIDTH, THUMB_HEIGHT), interval=THUMB_INTERVAL, cache_dir=None):
+        name = hashlib.sha1(os.path.abspath(folder).encode('utf-8')).hexdigest()[:16]
+        base = os.path.join(cache_dir or user_cache_dir(), 'thumbs')
+        os.makedirs(base, exist_ok=True)
+        self.sprite_path = os.path.join(base, name + '.rgb')
+        self.index_path = os.path.join(base, name + '.json')
+        self.size = size
+        self.interval = interval
+        self.shape = (size[1], size[0], 3)
+        self.slot_bytes = int(np.prod(self.shape))
+        self.entries = {}
+        self.by_path = {}
+        self.slots = 0
+        self.sprite = None
+        self.stop_flag = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.next_paths = None
+        self.load_index()
+
+    def load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            available = os.path.getsize(self.sprite_path) // self.slot_bytes
+        except (OSError, ValueError):
+            return
+        if index.get('size') != list(self.size) or index.get('interval') != self.interval:
+            return
+        self.slots = min(index['slots'], available)
+        self.entries = {key: tuple(entry) for key, entry in index['entries'].items()
+                        if entry[0] + entry[1] <= self.slots}
+
+    def save_index(self):
+        index = {'size': list(self.size), 'interval': self.interval, 'slots': self.slots, 'entries': self.entries}
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def start(self, paths):
+        with self.lock:
+            self.next_paths = list(paths)
+            if self.thread is not None:
+                return
+            self.stop_flag.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_flag.set()
+
+    def run(self):
+        while True:
+            with self.lock:
+                paths, self.next_paths = self.next_paths, None
+                if paths is None or self.stop_flag.is_set():
+                    self.thread = None
+                    return
+            self.generate_all(paths)
+
+    def generate_all(self, paths):
+        pending = []
+        for path in paths:
+            try:
+                key = self.key(path)
+            except OSError:
+                continue
+            if key in self.entries:
+                self.by_path[path] = self.entries[key]
+            else:
+                pending.append((path, key))
+
+        with open(self.sprite_path, 'a+b') as f:
+            f.truncate(self.slots * self.slot_bytes)
+            for path, key in pending:
+                count = self.generate(path, f)
+                if count is None:
+                    break
+                f.flush()
+                first = self.slots
+                self.slots += count
+                self.entries[key] = self.by_path[path] = (first, count)
+                self.save_index()
+
+    def generate(self, path, f):
+        cap = cv2.VideoCapture(path)
+        frame_rate = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        step = max(int(round(self.interval * frame_rate)), 1)
+        thumb = np.empty(self.shape, dtype=np.uint8)
+        count = 0
+        try:
+            while not self.stop_flag.is_set():
+                if frame_count > 0 and count * step >= frame_count:
+                    break
+                if count and step > SEEK_STRIDE_FRAMES:
+                    cap.set(cv2.CAP_PROP_POS_MSEC, count * self.interval * 1000)
+                elif count:
+                    for _ in range(step - 1):
+                        cap.grab()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                cv2.resize(frame, self.size, dst=thumb, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB, dst=thumb)
+                f.write(thumb.data)
+                count += 1
+        finally:
+            cap.release()
+        return None if self.stop_flag.is_set() else count
+
+    def lookup(self, path, offset):
+        entry = self.by_path.get(path)
+        if entry is None or entry[1] == 0:
+            return None
+        first, count = entry
+        slot = first + min(max(int(offset / self.interval), 0), count - 1)
+        if self.sprite is None or slot >= len(self.sprite):
+            self.sprite = np.memmap(self.sprite_path, dtype=np.uint8, mode='r',
+                                    shape=(max(self.slots, first + count),) + self.shape)
+        return self.sprite[slot]
+
+
+class FrameCache:
+    """
+    已解码帧的 LRU 缓存，保存展示分辨率的 RGB 帧，按 (文件, 文件内毫秒) 索引。
+    热帧在内存里，超出内存预算时最旧的帧溢出到本地磁盘上的 np.memmap 文件，磁盘预算也用完才真正淘汰。
+    磁盘层默认关闭；溢出文件映射后立即删除，进程崩溃也不会在缓存目录里留下残余。
+    只在解码线程上读写。
+    """
+
+    def __init__(self, ram_bytes=FRAME_CACHE_RAM_MB << 20, spill_bytes=FRAME_CACHE_SPILL_MB << 20, spill_dir=None):
+        self.ram_bytes = ram_bytes
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.spill_path = None
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.spilled = 0
+        self.evicted = 0
+        self.reset(None)
+
+    def reset(self, shape):
+        self.close()
+        self.shape = shape
+        self.ram = OrderedDict()
+        self.spill = OrderedDict()
+        self.times = {}
+        self.spill_map = None
+        self.free_slots = []
+        self.next_slot = 0
+        frame_bytes = int(np.prod(shape)) if shape else 0
+        self.ram_capacity = self.ram_bytes // frame_bytes if frame_bytes else 0
+        self.spill_capacity = self.spill_bytes // frame_bytes if frame_bytes else 0
+
+    def put(self, key, frame):
+        if frame.shape != self.shape:
+            self.reset(frame.shape)
+        if self.ram_capacity == 0:
+            return
+        if key in self.ram:
+            self.ram.move_to_end(key)
+            return
+        slot = self.spill.pop(key, None)
+        if slot is not None:
+            self.free_slots.append(slot)
+        else:
+            bisect.insort(self.times.setdefault(key[0], []), key[1])
+        buffer = self.make_room()
+        np.copyto(buffer, frame)
+        self.ram[key] = buffer
+
+    def make_room(self):
+        if len(self.ram) < self.ram_capacity:
+            return np.empty(self.shape, dtype=np.uint8)
+        key, buffer = self.ram.popitem(last=False)
+        self.spill_frame(key, buffer)
+        return buffer
+
+    def spill_frame(self, key, frame):
+        if self.spill_capacity == 0:
+            self.forget(key)
+            self.evicted += 1
+            return
+        if self.spill_map is None:
+            fd, self.spill_path = tempfile.mkstemp(prefix='frames-', suffix='.spill',
+                                                   dir=self.spill_dir or user_cache_dir())
+            os.close(fd)
+            self.spill_map = np.memmap(self.spill_path, dtype=np.uint8, mode='w+',
+                                       shape=(self.spill_capacity,) + self.shape)
+            try:
+                os.remove(self.spill_path)
+                self.spill_path = None
+            except OSError:
+                pass
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        elif self.next_slot < self.spill_capacity:
+            slot = self.next_slot
+            self.next_slot += 1
+        else:
+            old_key, slot = self.spill.popitem(last=False)
+            self.forget(old_key)
+            self.evicted += 1
+        self.spill_map[slot] = frame
+        self.spill[key] = slot
+        self.spilled += 1
+
+    def forget(self, key):
+        times = self.times.get(key[0])
+        index = bisect.bisect_left(times, key[1])
+        if index < len(times) and times[index] == key[1]:
+            del times[index]
+
+    def get(self, key):
+        frame = self.ram.get(key)
+        if frame is not None:
+            self.ram.move_to_end(key)
+            self.hits += 1
+            return frame
+        slot = self.spill.get(key)
+        if slot is not None:
+            self.spill.move_to_end(key)
+            self.spill_hits += 1
+            return self.spill_map[slot]
+        self.misses += 1
+        return None
+
+    def find(self, filepath, ms, tolerance):
+        times = self.times.get(filepath, ())
+        index = bisect.bisect_right(times, ms) - 1
+        if index >= 0 and ms - times[index] <= tolerance:
+            return times[index]
+        return None
+
+    def next_after(self, filepath, ms, gap):
+        times = self.times.get(filepath, ())
+        index = bisect.bisect_right(times, ms)
+        if index < len(times) and times[index] - ms <= gap:
+            return times[index]
+        return None
+
+    def stats(self):
+        return {
+            'ram_frames': len(self.ram),
+            'spill_frames': len(self.spill),
+            'hits': self.hits,
+            'spill_hits': self.spill_hits,
+            'misses': self.misses,
+            'spilled': self.spilled,
+            'evicted': self.evicted,
+        }
+
+    def close(self):
+        self.spill_map = None
+        if self.spill_path is not None:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+
+class LoopBuffer:
+    """
+    区间帧缓冲：时间轴上一段区间只解码一遍，转换好的帧存进一块预分配的数组。
+    A/B 循环用它从内存按任意倍速循环播放，倒放用它按 GOP 分块解码后逆序送出。帧数受预算限制，超出的部分被截断。
+    """
+
+    def __init__(self, markers, shape, budget=LOOP_BUFFER_MB << 20, frames=None):
+        self.markers = markers
+        self.shape = shape
+        self.budget = budget
+        self.frames = frames
+        self.pts = []
+        self.rates = []
+
+    def __len__(self):
+        return len(self.pts)
+
+    def append(self, pts, frame_rate):
+        if self.frames is None:
+            start, end = self.markers
+            count = int(math.ceil((end - start) * frame_rate * 1.1)) + 2
+            count = max(min(count, self.budget // int(np.prod(self.shape))), 1)
+            self.frames = np.empty((count,) + self.shape, dtype=np.uint8)
+        if len(self.pts) == len(self.frames):
+            return None
+        self.pts.append(pts)
+        self.rates.append(frame_rate)
+        return self.frames[len(self.pts) - 1]
+
+    def locate(self, position):
+        return max(bisect.bisect_right(self.pts, position) - 1, 0)
+
+
+class RenderSurface:
+    """
+    渲染面：画布上只保留一个图像项，每种输出尺寸只创建一个 PhotoImage 和一块连续的 PIL 图像内存，
+    每帧把槽位数据原地写入这块内存再 paste，不再分配新的 PIL 图像。
+    连续内存依赖 Pillow 的内部接口，不可用时退回公开的 Image.frombuffer。
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.surfaces = {}
+        self.item = None
+        self.size = None
+
+    def show(self, frame):
+        size = (frame.shape[1], frame.shape[0])
+        surface = self.surfaces.get(size)
+        if surface is None:
+            if len(self.surfaces) >= RENDER_SURFACE_SIZES:
+                self.surfaces = {self.size: self.surfaces[self.size]}
+            image = None
+            if hasattr(Image.core, 'new_block') and hasattr(Image.Image, '_new'):
+                image = Image.new('RGB', (1, 1))._new(Image.core.new_block('RGB', size))
+            surface = self.surfaces[size] = (ImageTk.PhotoImage('RGB', size), image)
+        photo, image = surface
+        if image is not None:
+            image.frombytes(frame)
+        else:
+            image = Image.frombuffer('RGB', size, frame, 'raw', 'RGB', 0, 1)
+        photo.paste(image)
+
+        if self.item is None:
+            self.item = self.canvas.create_image(0, 0, anchor=tk.NW, image=photo)
+        elif size != self.size:
+            self.canvas.itemconfig(self.item, image=photo)
+        self.size = size
+
+
+class StageStats:
+    """
+    各流水线阶段的耗时统计。每个阶段一个预分配的环形样本数组（最近 STAGE_SAMPLES 个）和累计次数/总耗时，
+    record 只是一次数组写入，常开的开销可以忽略；分位数和直方图在读取时才计算。
+    """
+
+    def __init__(self, size=STAGE_SAMPLES):
+        self.size = size
+        self.samples = {}
+        self.counts = {}
+        self.totals = {}
+
+    def record(self, stage, seconds):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = np.zeros(self.size)
+            self.counts[stage] = 0
+            self.totals[stage] = 0.0
+        count = self.counts[stage]
+        samples[count % self.size] = seconds
+        self.counts[stage] = count + 1
+        self.totals[stage] += seconds
+
+    def window(self, stage, last=None):
+        count = self.counts.get(stage, 0)
+        length = min(count, self.size, last or self.size)
+        if length == 0:
+            return np.empty(0)
+        return self.samples[stage].take(range(count - length, count), mode='wrap') * 1000
+
+    def percentiles(self, stage, points=(50, 90, 99), last=None):
+        data = self.window(stage, last)
+        if len(data) == 0:
+            return {}
+        return {f'p{point}': float(np.percentile(data, point)) for point in points}
+
+    def histogram(self, stage, edges=STAGE_HISTOGRAM_MS):
+        counts, _ = np.histogram(self.window(stage), bins=edges)
+        return counts.tolist()
+
+    def snapshot(self):
+        stages = {}
+        for stage in list(self.samples):
+            data = self.window(stage)
+            stages[stage] = {
+                'count': self.counts[stage],
+                'mean_ms': self.totals[stage] / self.counts[stage] * 1000,
+                **self.percentiles(stage),
+                'max_ms': float(data.max()),
+                'histogram': self.histogram(stage),
+            }
+        return stages
+
+    def summary(self):
+        return {stage: self.percentiles(stage) for stage in list(self.samples)}
+
+
+class StatsDumper:
+    """
+    后台线程，每隔 interval 秒把播放统计追加到文件：扩展名为 .csv 时每个阶段一行，否则写 JSON Lines。
+    """
+
+    CSV_FIELDS = ['time', 'stage', 'count', 'mean_ms', 'p50', 'p90', 'p99', 'max_ms',
+                  'fps', 'queue_depth', 'dropped_frames']
+
+    def __init__(self, snapshot, path, interval=STATS_DUMP_SECONDS):
+        self.snapshot = snapshot
+        self.path = path
+        self.interval = interval
+        self.stop_flag = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_flag.set()
+
+    def run(self):
+        while not self.stop_flag.wait(self.interval):
+            try:
+                self.write(self.snapshot())
+            except OSError as e:
+                print(f"统计写入失败: {self.path}: {e}", file=sys.stderr)
+                return
+
+    def write(self, stats):
+        if not self.path.lower().endswith('.csv'):
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(stats, ensure_ascii=False) + '\n')
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, self.CSV_FIELDS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for stage, values in stats['stages'].items():
+                writer.writerow({**stats, **values, 'stage': stage})
 
-class VideoPlayer(tk.Tk):
-    def __init__(self, folder):
-        super().__init__()
-        self.title("多视频播放器")
-        self.geometry("800x600")
 
+class PlaybackCore:
+    """
+    播放内核：探测、时间轴、解码线程、帧缓冲和展示调度，不依赖 Tk。
+    VideoPlayer 在它上面加界面，HeadlessPlayer 用它做无界面播放和基准测试。
+    """
+
+    def init_playback(self, folder, probe_workers=PROBE_WORKERS, audio_sink=None, audio=True, probe_cache_path=None):
         self.folder = folder
+        self.probe_cache = ProbeCache(probe_cache_path)
+        self.probe_workers = probe_workers
+        self.probe_pool = None
+        self.probe_results = queue.Queue()
         self.video_files = self.get_video_files()
         self.total_duration = self.calculate_total_duration()
         self.current_video_index = 0
         self.current_position = 0
         self.resolution = "640x480"
         self.scale = 1.0
+        self.decoder_backend = DECODER_OPENCV
+        self.interpolation_mode = INTERPOLATION_OFF
+        self.mosaic_grid = None
+        self.loop_a = None
+        self.loop_b = None
+        self.update_geometry()
+
+        self.stop_flag = threading.Event()
+        self.frame_buffer = FrameRingBuffer(FRAME_BUFFER_CAPACITY, self.output_shape)
+        self.decoder_thread = None
+        self.clock = PresentationClock()
+        self.audio = None
+        if audio:
+            if audio_sink is None:
+                audio_sink = DeviceAudioSink() if sounddevice is not None else NullAudioSink()
+            self.audio = AudioEngine(audio_sink, self.clock)
+        self.seek_lock = threading.Lock()
+        self.seek_request = None
+        self.seek_serial = None
+        self.keyframe_index = {}
+        self.keyframe_pool = ThreadPoolExecutor(max_workers=1)
+        self.prefetcher = Prefetcher(self.open_capture)
+        self.boundary_gaps = deque(maxlen=100)
+        self.use_keyframe_index = False
+        self.snap_to_keyframe = False
+        self.serials = itertools.count()
+        self.loop_playlist = True
+        self.finished = False
+        self.decoded_frames = 0
+        self.presented_frames = 0
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+        self.stage_stats = StageStats()
+        self.present_times = deque(maxlen=STATS_RECENT_SAMPLES)
+        self.stats_dumper = None
+        self.interpolator = FrameInterpolator()
+        self.frame_cache = FrameCache()
+        self.cached_frames = 0
+        self.step_request = 0
+        self.stepping = False
+        self.running = False
+        self.reverse_cancel = None
+        self.speed = 1.0
+
+    def get_video_files(self):
+        self.scanner = LibraryScanner(self.folder)
+        self.library = self.scanner.scan()
+        return sorted(self.library, key=natural_key)
+
+    def calculate_total_duration(self):
+        self.video_info = [None] * len(self.video_files)
+        self.file_index = {video: index for index, video in enumerate(self.video_files)}
+        self.probe_pending = 0
+        self.probe_count = 0
+        self.probe_started = time.monotonic()
+        pending = []
+        for index, video in enumerate(self.video_files):
+            filepath = os.path.join(self.folder, video)
+            info = self.probe_cache.get(filepath)
+            if info is None:
+                pending.append(video)
+            else:
+                self.video_info[index] = info
+
+        self.probe_files(pending)
+        self.rebuild_timeline()
+        return self.timeline.total
+
+    def probe_files(self, videos):
+        if not videos:
+            return
+        if self.probe_pool is None:
+            self.probe_pool = ThreadPoolExecutor(max_workers=self.probe_workers)
+            self.probe_count = 0
+            self.probe_started = time.monotonic()
+        self.probe_pending += len(videos)
+        self.probe_count += len(videos)
+        for video in videos:
+            self.probe_pool.submit(self.probe_worker, video, os.path.join(self.folder, video))
+
+    def playlist(self):
+        with self.seek_lock:
+            return self.video_files, self.video_info, self.timeline
+
+    def rebuild_timeline(self):
+        self.timeline = TimelineIndex([info['duration'] if info else 0.0 for info in self.video_info])
+        self.total_duration = self.timeline.total
+
+    def probe_worker(self, video, filepath):
+        try:
+            info = self.probe_cache.probe(filepath)
+        except (ffmpeg.Error, OSError, ValueError, KeyError) as e:
+            print(f"探测失败: {filepath}: {e}", file=sys.stderr)
+            info = None
+        self.probe_results.put((video, info))
+
+    def update_library(self, snapshot):
+        changed = [video for video, signature in snapshot.items() if self.library.get(video) != signature]
+        removed = [video for video in self.library if video not in snapshot]
+        if not changed and not removed:
+            return False
+
+        anchor = self.playing_anchor()
+        known = {video: self.video_info[i] for i, video in enumerate(self.video_files) if video not in changed}
+        for video in changed:
+            self.keyframe_index.pop(os.path.join(self.folder, video), None)
+
+        video_files = sorted(snapshot, key=natural_key)
+        self.library = snapshot
+        with self.seek_lock:
+            self.video_info = [known.get(video) for video in video_files]
+            self.file_index = {video: i for i, video in enumerate(video_files)}
+            self.video_files = video_files
+            self.rebuild_timeline()
+        self.probe_files(changed)
+
+        if not video_files:
+            self.stop_playback()
+            return True
+        if anchor is not None and (anchor[0] in removed or anchor[0] in changed):
+            index = min(self.current_video_index, len(video_files) - 1)
+            self.current_video_index = index
+            self.seek(self.timeline.start_of(index))
+        else:
+            self.restore_anchor(anchor)
+        return True
+
+    def playing_anchor(self):
+        if not self.video_files:
+            return None
+        index, offset = self.timeline.locate(self.current_position)
+        return self.video_files[index], offset, self.timeline.start_of(index)
+
+    def restore_anchor(self, anchor):
+        if anchor is None:
+            return
+        video, offset, start = anchor
+        index = self.file_index.get(video)
+        if index is not None and self.timeline.start_of(index) != start:
+            self.seek(self.timeline.start_of(index) + offset)
+
+    def collect_probe_results(self):
+        anchor = self.playing_anchor()
+        changed = False
+        collected = 0
+        while True:
+            try:
+                video, info = self.probe_results.get_nowait()
+            except queue.Empty:
+                break
+            self.probe_pending -= 1
+            collected += 1
+            index = self.file_index.get(video)
+            if index is not None:
+                self.video_info[index] = info
+                changed = True
+
+        if collected:
+            self.probe_cache.commit()
+        if changed:
+            self.rebuild_timeline()
+            self.restore_anchor(anchor)
+        return changed
+
+    def finish_probing(self):
+        self.probe_cache.commit()
+        if self.probe_pool is None:
+            return
+        self.probe_pool.shutdown(wait=False)
+        self.probe_pool = None
+        elapsed = max(time.monotonic() - self.probe_started, 1e-6)
+        self.probe_throughput = self.probe_count / elapsed
+        print(f"探测完成: {self.probe_count} 个文件, 用时 {elapsed:.2f}s, "
+              f"{self.probe_throughput:.1f} 文件/秒 ({self.probe_workers} 个线程)", file=sys.stderr)
+
+    def open_capture(self, filepath, size=None):
+        if self.decoder_backend == DECODER_FFMPEG_PIPE:
+            if size is None:
+                height, width = self.output_shape[:2]
+                size = (width, height)
+            return FFmpegPipeCapture(self.probe_cache, size, filepath)
+        return cv2.VideoCapture(filepath)
+
+    def update_geometry(self):
+        width, height = map(int, self.resolution.split('x'))
+        width, height = max(1, int(width * self.scale)), max(1, int(height * self.scale))
+        self.output_shape = (height, width, 3)
+        self.resize_plans = {}
+
+    def resize_plan(self, source):
+        plans = self.resize_plans
+        plan = plans.get(source)
+        if plan is None:
+            shape = self.output_shape
+            src_height, src_width = source
+            if (src_height, src_width) == shape[:2]:
+                interpolation = None
+            elif shape[1] * 2 <= src_width and shape[0] * 2 <= src_height:
+                interpolation = cv2.INTER_AREA
+            else:
+                interpolation = cv2.INTER_LINEAR
+            plan = plans[source] = ResizePlan((shape[1], shape[0]), shape, interpolation)
+        return plan
+
+    def start_playback(self):
+        self.halt_decoder()
+        self.frame_buffer.clear()
+        if self.use_keyframe_index:
+            self.request_keyframes(os.path.join(self.folder, self.video_files[self.current_video_index]))
+        if self.mosaic_grid is not None:
+            target = self.play_mosaic
+        elif self.loop_active():
+            target = self.play_loop
+        elif self.speed < 0:
+            target = self.play_reverse
+        else:
+            target = self.play
+        self.running = True
+        self.decoder_thread = threading.Thread(target=self.run_decoder, daemon=True,
+                                               args=(self.decoder_thread, target))
+        self.decoder_thread.start()
+
+    def run_decoder(self, previous, target):
+        if previous is not None:
+            previous.join()
+        with self.seek_lock:
+            if not self.running or self.decoder_thread is not threading.current_thread():
+                return
+            self.stop_flag.clear()
+            self.finished = False
+            if self.seek_request is None:
+                self.seek_request = (self.current_position, True)
+        target()
+
+    def stop_playback(self):
+        self.halt_decoder()
+        if self.audio is not None:
+            self.audio.stop()
+
+    def halt_decoder(self):
+        with self.seek_lock:
+            self.running = False
+            self.stop_flag.set()
+            cancel = self.reverse_cancel
+        if cancel is not None:
+            cancel.set()
+
+    def play(self):
+        cap = cv2.VideoCapture()
+        opened_path = None
+        backend = self.decoder_backend
+        serial = next(self.serials)
+        preroll = deque()
+        boundary_started = None
+        next_pts = 0.0
+        last_written = time.perf_counter()
+        self.grab_cost = None
+        self.seek_cost = None
+
+        while not self.stop_flag.is_set():
+            offset = None
+            video_files, _, timeline = self.playlist()
+            request = self.take_seek_request()
+            if request is not None:
+                position, exact = request
+                self.current_video_index, offset = timeline.locate(position)
+                serial = self.seek_serial = next(self.serials)
+                next_pts = 0.0
+                self.frame_buffer.clear()
+            if backend != self.decoder_backend:
+                backend = self.decoder_backend
+                self.prefetcher.cancel()
+                opened_path = None
+            if not video_files:
+                self.finished = True
+                break
+
+            index = self.current_video_index = min(self.current_video_index, len(video_files) - 1)
+            filepath = os.path.join(self.folder, video_files[index])
+            if opened_path != filepath:
+                prefetched = self.prefetcher.take(filepath) if offset is None else None
+                cap.release()
+                if prefetched is not None:
+                    cap, frame_rate, preroll = prefetched
+                else:
+                    self.prefetcher.cancel()
+                    preroll.clear()
+                    cap = self.open_capture(filepath)
+                    frame_rate = cap.get(cv2.CAP_PROP_FPS) or 25.0
+                rgb = getattr(cap, 'rgb', False)
+                opened_path = filepath
+                self.post_ui('file', video_files[index])
+                if self.use_keyframe_index:
+                    self.request_keyframes(filepath)
+                next_index = (index + 1) % len(video_files)
+                self.prefetcher.start(os.path.join(self.folder, video_files[next_index]))
+            elif offset is not None:
+                preroll.clear()
+            file_start = timeline.start_of(index)
+            if offset is not None:
+                replayed = self.replay_cached(filepath, file_start, offset, frame_rate, serial)
+                if replayed is not None:
+                    offset, exact = replayed + 0.5 / frame_rate, True
+                    next_pts = file_start + offset
+                if self.seek_request is not None:
+                    continue
+                started = time.perf_counter()
+                self.seek_capture(cap, filepath, offset, frame_rate, exact)
+                if exact and not isinstance(cap, FFmpegPipeCapture):
+                    self.seek_cost = time.perf_counter() - started
+
+            eof = False
+            while not self.stop_flag.is_set() and self.seek_request is None:
+                if preroll:
+                    position, frame = preroll.popleft()
+                    pts = file_start + position
+                else:
+                    if rgb:
+                        height, width = self.output_shape[:2]
+                        cap.set_output_size((width, height))
+                    started = time.perf_counter()
+                    if not cap.grab():
+                        eof = True
+                        break
+                    grabbed = time.perf_counter() - started
+                    self.grab_cost = grabbed if self.grab_cost is None else 0.9 * self.grab_cost + 0.1 * grabbed
+                    pts = file_start + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                    frame = None
+                if pts < next_pts:
+                    self.skipped_frames += 1
+                    continue
+                late = self.clock.is_late(pts, 1 / frame_rate, serial)
+                if late and time.perf_counter() - last_written < MAX_LATE_DROP_MS / 1000:
+                    self.dropped_frames += 1
+                    target = self.skip_target(pts, late, frame_rate)
+                    if target is not None:
+                        preroll.clear()
+                        next_pts = target - 0.5 / frame_rate
+                        if not self.skip_ahead(cap, filepath, pts - file_start, target - file_start, frame_rate):
+                            eof = True
+                            break
+                    continue
+                if frame is None:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        eof = True
+                        break
+                    self.stage_stats.record('decode', time.perf_counter() - started)
+                self.decoded_frames += 1
+                if boundary_started is not None:
+                    self.boundary_gaps.append((time.perf_counter() - boundary_started) * 1000)
+                    boundary_started = None
+                self.write_frame(frame, FrameInfo(pts, frame_rate, serial), rgb,
+                                 (filepath, int(round((pts - file_start) * 1000))))
+                last_written = time.perf_counter()
+
+                target = self.skip_target(pts, late, frame_rate)
+                next_pts = target - 0.5 / frame_rate if target is not None else 0.0
+                if target is not None and not self.skip_ahead(cap, filepath, pts - file_start,
+                                                              target - file_start, frame_rate):
+                    eof = True
+                    break
+            if not eof:
+                boundary_started = None
+                continue
+
+            boundary_started = time.perf_counter()
+            opened_path = None
+            if self.current_video_index < len(video_files) - 1:
+                self.current_video_index += 1
+            elif self.loop_playlist:
+                self.current_video_index = 0
+                serial = next(self.serials)
+                next_pts = 0.0
+            else:
+                self.finished = True
+                break
+
+        cap.release()
+        self.prefetcher.cancel()
+
+    def play_mosaic(self):
+        paths = [os.path.join(self.folder, video) for video in self.video_files]
+        durations = [info['duration'] if info else 0.0 for info in self.video_info]
+        mosaic = None
+        serial = next(self.serials)
+        pts = 0.0
+
+        while not self.stop_flag.is_set():
+            request = self.take_seek_request()
+            if request is not None:
+                pts = request[0]
+                serial = self.seek_serial = next(self.serials)
+                self.frame_buffer.clear()
+            if mosaic is None or mosaic.shape != self.output_shape:
+                if mosaic is not None:
+                    mosaic.close()
+                mosaic = Mosaic(paths, durations, self.mosaic_grid, self.output_shape, self.open_capture)
+                self.frame_buffer.allocate(mosaic.shape)
+            if mosaic.total and pts >= mosaic.total:
+                if not self.loop_playlist:
+                    self.finished = True
+                    break
+                pts = 0.0
+                serial = next(self.serials)
+
+            slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+            if slot is None or slot.shape != mosaic.shape:
+                continue
+            step = max(self.speed, 1.0) / MOSAIC_FPS
+            started = time.perf_counter()
+            mosaic.render(pts, slot)
+            self.stage_stats.record('mosaic', time.perf_counter() - started)
+            self.decoded_frames += 1
+            self.frame_buffer.commit_write(generation, FrameInfo(pts, 1 / step, serial))
+            pts += step
+
+        if mosaic is not None:
+            mosaic.close()
+
+    def is_playing(self):
+        return self.decoder_thread is not None and self.running
+
+    def loop_active(self):
+        return self.loop_a is not None and self.loop_b is not None and self.loop_b > self.loop_a
+
+    def set_loop(self, start, end):
+        if start is not None and end is not None and end < start:
+            start, end = end, start
+        was_looping = self.loop_active()
+        self.loop_a, self.loop_b = start, end
+        if self.is_playing() and self.mosaic_grid is None and self.loop_active() != was_looping:
+            self.stop_playback()
+            self.start_playback()
+
+    def play_loop(self):
+        loop = None
+        serial = next(self.serials)
+        index = 0
+
+        while not self.stop_flag.is_set() and self.loop_active():
+            markers = (self.loop_a, self.loop_b)
+            if loop is None or loop.markers != markers or loop.shape != self.output_shape:
+                loop = LoopBuffer(markers, self.output_shape)
+                self.fill_loop(loop, next(self.serials))
+                if len(loop) == 0:
+                    break
+                index = 0
+                serial = next(self.serials)
+                continue
+
+            request = self.take_seek_request()
+            if request is not None:
+                index = loop.locate(request[0])
+                serial = self.seek_serial = next(self.serials)
+                self.frame_buffer.clear()
+            if self.frame_buffer.shape != loop.shape:
+                self.frame_buffer.allocate(loop.shape)
+            slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+            if slot is None or slot.shape != loop.shape:
+                continue
+            np.copyto(slot, loop.frames[index])
+            self.frame_buffer.commit_write(generation, FrameInfo(loop.pts[index], loop.rates[index], serial))
+            self.cached_frames += 1
+            step = max(1, int(abs(self.speed) * loop.rates[index] / FAST_FORWARD_FPS))
+            index += step if self.speed > 0 else -step
+            if not 0 <= index < len(loop):
+                index = 0 if index >= len(loop) else len(loop) - 1
+                serial = next(self.serials)
+
+    def fill_loop(self, loop, serial):
+        start, end = loop.markers
+        for pts, frame, rgb, frame_rate in self.decode_range(start, end):
+            if self.stop_flag.is_set() or (self.loop_a, self.loop_b) != loop.markers:
+                return
+            dst = loop.append(pts, frame_rate)
+            if dst is None:
+                print(f"循环区间超出缓冲上限，截断为 {loop.pts[-1] - start:.1f}s", file=sys.stderr)
+                return
+            started = time.perf_counter()
+            self.convert_frame(frame, dst, self.resize_plan(frame.shape[:2]), rgb)
+            self.stage_stats.record('convert', time.perf_counter() - started)
+            self.decoded_frames += 1
+            if self.frame_buffer.shape != loop.shape:
+                self.frame_buffer.allocate(loop.shape)
+            slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+            if slot is None:
+                return
+            if slot.shape == dst.shape:
+                np.copyto(slot, dst)
+                self.frame_buffer.commit_write(generation, FrameInfo(pts, frame_rate, serial))
+
+    def play_reverse(self):
+        budget = (REVERSE_BUFFER_MB << 20) // 2
+        pool = ThreadPoolExecutor(max_workers=1)
+        cancel = self.reverse_cancel = threading.Event()
+        serial = next(self.serials)
+        position = self.current_position
+        pending = None
+        spare = []
+        captures = {}
+
+        try:
+            while not self.stop_flag.is_set() and self.speed < 0 and self.total_duration > 0:
+                request = self.take_seek_request()
+                if request is not None:
+                    position = request[0]
+                    serial = self.seek_serial = next(self.serials)
+                    self.frame_buffer.clear()
+                    cancel.set()
+                    pending = None
+                if pending is None:
+                    cancel = self.reverse_cancel = threading.Event()
+                    pending = pool.submit(self.decode_region, *self.reverse_chunk(position, budget),
+                                          self.chunk_frames(spare, budget), cancel, captures)
+                region = pending.result()
+                if self.seek_request is not None:
+                    continue
+
+                position = region.markers[0]
+                wrapped = position <= 0.0
+                if wrapped and not self.loop_playlist:
+                    pending = None
+                else:
+                    if wrapped:
+                        position = self.total_duration
+                    cancel = self.reverse_cancel = threading.Event()
+                    pending = pool.submit(self.decode_region, *self.reverse_chunk(position, budget),
+                                          self.chunk_frames(spare, budget), cancel, captures)
+
+                index = len(region) - 1
+                while index >= 0 and not self.stop_flag.is_set() and self.seek_request is None:
+                    if self.frame_buffer.shape != region.shape:
+                        self.frame_buffer.allocate(region.shape)
+                    slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+                    if slot is None or slot.shape != region.shape:
+                        break
+                    np.copyto(slot, region.frames[index])
+                    frame_rate = region.rates[index]
+                    self.frame_buffer.commit_write(generation, FrameInfo(region.pts[index], frame_rate, serial))
+                    index -= max(1, int(-self.speed * frame_rate / FAST_FORWARD_FPS))
+                spare.append(region.frames)
+                if pending is None:
+                    self.finished = True
+                    break
+                if wrapped:
+                    serial = next(self.serials)
+        finally:
+            cancel.set()
+            pool.submit(self.release_captures, captures)
+            pool.shutdown(wait=False)
+
+    def reverse_chunk(self, position, budget):
+        video_files, video_info, timeline = self.playlist()
+        index, offset = timeline.locate(position)
+        if offset <= 1e-3 and index > 0:
+            index -= 1
+            offset = position - timeline.start_of(index)
+        file_start = timeline.start_of(index)
+        filepath = os.path.join(self.folder, video_files[index])
+        frame_rate = (video_info[index] or {}).get('fps') or 25.0
+        span = max((budget // int(np.prod(self.output_shape)) - 2) / (frame_rate * 1.1), 1 / frame_rate)
+        start = max(offset - min(span, REVERSE_CHUNK_SECONDS), 0.0)
+        self.request_keyframes(filepath)
+        keyframes = self.keyframe_index.get(filepath)
+        if keyframes is not None and len(keyframes):
+            keyframe = keyframes[max(np.searchsorted(keyframes, offset - 0.5 / frame_rate) - 1, 0)]
+            if offset - keyframe <= span:
+                start = keyframe
+        return file_start + start, file_start + offset
+
+    def chunk_frames(self, spare, budget):
+        while spare:
+            frames = spare.pop()
+            if frames is not None and frames.shape[1:] == self.output_shape:
+                return frames
+        count = max(budget // int(np.prod(self.output_shape)), 2)
+        return np.empty((count,) + self.output_shape, dtype=np.uint8)
+
+    def decode_region(self, start, end, frames, stop_flag, captures=None):
+        started = time.perf_counter()
+        region = LoopBuffer((start, end), frames.shape[1:], frames=frames)
+        for pts, frame, rgb, frame_rate in self.decode_range(start, end, stop_flag, captures):
+            if self.stop_flag.is_set() or self.seek_request is not None:
+                break
+            dst = region.append(pts, frame_rate)
+            if dst is None:
+                break
+            self.convert_frame(frame, dst, self.resize_plan(frame.shape[:2]), rgb)
+            self.decoded_frames += 1
+        self.stage_stats.record('chunk', time.perf_counter() - started)
+        return region
+
+    def request_step(self, direction):
+        with self.seek_lock:
+            self.step_request += direction
+            if self.stepping:
+                return
+            self.stepping = True
+        self.halt_decoder()
+        self.decoder_thread = threading.Thread(target=self.play_step, daemon=True, args=(self.decoder_thread,))
+        self.decoder_thread.start()
+
+    def play_step(self, previous):
+        if previous is not None:
+            previous.join()
+        stop_flag = threading.Event()
+        while True:
+            with self.seek_lock:
+                direction, self.step_request = self.step_request, 0
+                if not direction:
+                    self.stepping = False
+                    return
+            self.step_frame(direction, stop_flag)
+
+    def step_frame(self, direction, stop_flag):
+        video_files, video_info, timeline = self.playlist()
+        if not video_files or not timeline.total:
+            return
+        index, _ = timeline.locate(self.current_position)
+        frame_rate = (video_info[index] or {}).get('fps') or 25.0
+        target = min(max(self.current_position + direction / frame_rate, 0.0), timeline.total)
+        index, offset = timeline.locate(target)
+        filepath = os.path.join(self.folder, video_files[index])
+        ms = self.frame_cache.find(filepath, offset * 1000 + 500 / frame_rate, 1000 / frame_rate)
+        cached = self.frame_cache.get((filepath, ms)) if ms is not None else None
+        self.frame_buffer.clear()
+        if cached is not None and cached.shape == self.output_shape:
+            if self.frame_buffer.shape != cached.shape:
+                self.frame_buffer.allocate(cached.shape)
+            slot, generation = self.frame_buffer.acquire_write(stop_flag)
+            np.copyto(slot, cached)
+            pts = timeline.start_of(index) + ms / 1000
+            self.cached_frames += 1
+        else:
+            for pts, frame, rgb, frame_rate in self.decode_range(target, timeline.total, stop_flag):
+                plan = self.resize_plan(frame.shape[:2])
+                if self.frame_buffer.shape != plan.shape:
+                    self.frame_buffer.allocate(plan.shape)
+                slot, generation = self.frame_buffer.acquire_write(stop_flag)
+                self.convert_frame(frame, slot, plan, rgb)
+                self.decoded_frames += 1
+                index, offset = timeline.locate(pts)
+                filepath = os.path.join(self.folder, video_files[index])
+                self.frame_cache.put((filepath, int(round(offset * 1000))), slot)
+                break
+            else:
+                return
+        self.frame_buffer.commit_write(generation, FrameInfo(pts, frame_rate, None))
+        self.seek(pts)
+        self.post_ui('step')
+
+    def decode_range(self, start, end, stop_flag=None, captures=None):
+        stop_flag = stop_flag or self.stop_flag
+        video_files, _, timeline = self.playlist()
+        index, offset = timeline.locate(start)
+        while index < len(video_files) and timeline.start_of(index) < end:
+            filepath = os.path.join(self.folder, video_files[index])
+            file_start = timeline.start_of(index)
+            cap = captures.get(filepath) if captures is not None else None
+            reused = cap is not None
+            if not reused:
+                cap = self.open_capture(filepath)
+                if captures is not None:
+                    self.release_captures(captures)
+                    captures[filepath] = cap
+            try:
+                frame_rate = cap.get(cv2.CAP_PROP_FPS) or 25.0
+                rgb = getattr(cap, 'rgb', False)
+                if offset > 0 or reused:
+                    self.seek_capture(cap, filepath, offset, frame_rate, True, stop_flag)
+                while not stop_flag.is_set():
+                    started = time.perf_counter()
+                    if not cap.grab():
+                        break
+                    pts = file_start + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                    if pts < start - 0.5 / frame_rate:
+                        continue
+                    if pts >= end - 0.5 / frame_rate:
+                        return
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    self.stage_stats.record('decode', time.perf_counter() - started)
+                    yield pts, frame, rgb, frame_rate
+            finally:
+                if captures is None:
+                    cap.release()
+            index += 1
+            offset = 0.0
+
+    @staticmethod
+    def release_captures(captures):
+        for cap in captures.values():
+            cap.release()
+        captures.clear()
+
+    def replay_cached(self, filepath, file_start, offset, frame_rate, serial):
+        cache = self.frame_cache
+        if cache.ram_capacity == 0 or self.interpolated_frames(frame_rate) > 0:
+            return None
+        gap = 1500 / frame_rate
+        ms = cache.find(filepath, offset * 1000 + 0.5, 1000 / frame_rate)
+        replayed = None
+        while ms is not None and not self.stop_flag.is_set() and self.seek_request is None:
+            frame = cache.get((filepath, ms))
+            if frame is None:
+                break
+            slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+            if slot is None or slot.shape != frame.shape:
+                break
+            np.copyto(slot, frame)
+            self.frame_buffer.commit_write(generation, FrameInfo(file_start + ms / 1000, frame_rate, serial))
+            self.cached_frames += 1
+            replayed = ms / 1000
+            ms = cache.next_after(filepath, ms, gap)
+        return replayed
+
+    def request_keyframes(self, filepath):
+        if filepath not in self.keyframe_index:
+            self.keyframe_index[filepath] = None
+            self.keyframe_pool.submit(self.load_keyframes, filepath)
+
+    def load_keyframes(self, filepath):
+        try:
+            self.keyframe_index[filepath] = self.probe_cache.keyframes(filepath)
+        except (ffmpeg.Error, OSError, ValueError, KeyError) as e:
+            print(f"关键帧索引失败: {filepath}: {e}", file=sys.stderr)
+
+    def seek_capture(self, cap, filepath, offset, frame_rate, exact, stop_flag=None):
+        stop_flag = stop_flag or self.stop_flag
+        keyframes = self.keyframe_index.get(filepath) if self.use_keyframe_index else None
+        if keyframes is None or len(keyframes) == 0 or isinstance(cap, FFmpegPipeCapture):
+            cap.set(cv2.CAP_PROP_POS_MSEC, offset * 1000)
+            return
+
+        keyframe = keyframes[max(np.searchsorted(keyframes, offset, side='right') - 1, 0)]
+        cap.set(cv2.CAP_PROP_POS_MSEC, keyframe * 1000)
+        if not exact:
+            return
+        target = offset - 1 / frame_rate
+        while cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 < target and not stop_flag.is_set():
+            if not cap.grab():
+                break
+
+    def fast_forward_stride(self, frame_rate):
+        stride = self.speed / FAST_FORWARD_FPS
+        if self.speed <= 1.0 or stride <= 1 / frame_rate:
+            return 0.0
+        return stride
+
+    def skip_target(self, pts, late, frame_rate):
+        stride = self.fast_forward_stride(frame_rate)
+        if late:
+            now = self.clock.now()
+            if stride or now - pts > LATE_RESYNC_SECONDS:
+                return now + (stride or LATE_RESYNC_SECONDS)
+        return pts + stride if stride else None
+
+    def skip_ahead(self, cap, filepath, offset, target, frame_rate):
+        if isinstance(cap, FFmpegPipeCapture) or self.grab_cost is None:
+            return True
+        seek_cost = self.seek_cost if self.seek_cost is not None else SEEK_STRIDE_FRAMES * self.grab_cost
+        if (target - offset) * frame_rate * self.grab_cost <= seek_cost:
+            return True
+        started = time.perf_counter()
+        skipped = self.skip_capture(cap, filepath, target)
+        elapsed = time.perf_counter() - started
+        self.seek_cost = elapsed if self.seek_cost is None else 0.9 * self.seek_cost + 0.1 * elapsed
+        return skipped
+
+    def skip_capture(self, cap, filepath, offset):
+        keyframes = self.keyframe_index.get(filepath) if self.use_keyframe_index else None
+        if keyframes is not None and len(keyframes) and not isinstance(cap, FFmpegPipeCapture):
+            index = np.searchsorted(keyframes, offset)
+            if index == len(keyframes):
+                return False
+            offset = keyframes[index]
+        return cap.set(cv2.CAP_PROP_POS_MSEC, offset * 1000)
+
+    def interpolated_frames(self, frame_rate):
+        if self.interpolation_mode == INTERPOLATION_OFF or self.speed >= 1.0:
+            return 0
+        return min(MAX_INTERPOLATED_FRAMES, math.ceil(SLOW_MOTION_FPS / (frame_rate * self.speed)) - 1)
+
+    def write_frame(self, frame, info, rgb=False, cache_key=None):
+        plan = self.resize_plan(frame.shape[:2])
+        if plan.shape != self.frame_buffer.shape:
+            self.frame_buffer.allocate(plan.shape)
+
+        count = self.interpolated_frames(info.frame_rate)
+        if count <= 0:
+            self.interpolator.reset()
+            slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+            if slot is None or slot.shape != plan.shape:
+                return
+            started = time.perf_counter()
+            self.convert_frame(frame, slot, plan, rgb)
+            self.stage_stats.record('convert', time.perf_counter() - started)
+            if cache_key is not None:
+                self.frame_cache.put(cache_key, slot)
+            self.frame_buffer.commit_write(generation, info)
+            return
+
+        interpolator = self.interpolator
+        started = time.perf_counter()
+        self.convert_frame(frame, interpolator.next_buffer(plan.shape), plan, rgb)
+        self.stage_stats.record('convert', time.perf_counter() - started)
+        previous_info, interpolator.previous_info = interpolator.previous_info, info
+        frame_rate = info.frame_rate * (count + 1)
+        if (previous_info is not None and previous_info.serial == info.serial
+                and 0 < info.pts - previous_info.pts <= 2 / info.frame_rate):
+            mode = self.interpolation_mode
+            interpolator.prepare(mode)
+            for step in range(1, count + 1):
+                t = step / (count + 1)
+                slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+                if slot is None or slot.shape != plan.shape:
+                    return
+                interpolator.interpolate(t, mode, slot)
+                pts = previous_info.pts + t * (info.pts - previous_info.pts)
+                self.frame_buffer.commit_write(generation, FrameInfo(pts, frame_rate, info.serial))
+
+        slot, generation = self.frame_buffer.acquire_write(self.stop_flag)
+        if slot is None or slot.shape != plan.shape:
+            return
+        np.copyto(slot, interpolator.current)
+        self.frame_buffer.commit_write(generation, info._replace(frame_rate=frame_rate))
+
+    def convert_frame(self, frame, dst, plan, rgb):
+        started = time.perf_counter()
+        if plan.interpolation is None:
+            if rgb:
+                np.copyto(dst, frame)
+            else:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+            self.stage_stats.record('color', time.perf_counter() - started)
+            return
+        cv2.resize(frame, plan.size, dst=dst, interpolation=plan.interpolation)
+        resized = time.perf_counter()
+        self.stage_stats.record('resize', resized - started)
+        if not rgb:
+            cv2.cvtColor(dst, cv2.COLOR_BGR2RGB, dst=dst)
+            self.stage_stats.record('color', time.perf_counter() - resized)
+
+    def present_due_frame(self):
+        delay = 5
+        frame, info, generation = self.frame_buffer.peek()
+        while frame is not None:
+            if info.serial != self.clock.serial:
+                self.clock.reset(info.pts, self.speed, info.serial)
+                self.start_audio()
+            wait = self.clock.time_until(info.pts)
+            if wait > 0:
+                delay = int(wait * 1000)
+                break
+            if len(self.frame_buffer) > 1 and self.clock.is_late(info.pts, 1 / info.frame_rate, info.serial):
+                self.frame_buffer.release(generation)
+                self.dropped_frames += 1
+                frame, info, generation = self.frame_buffer.peek()
+                continue
+            started = time.perf_counter()
+            self.present_frame(frame, info)
+            self.stage_stats.record('present', time.perf_counter() - started)
+            self.frame_buffer.release(generation)
+            delay = 1
+            break
+        return min(max(delay, 1), MAX_RENDER_WAIT_MS)
+
+    def present_frame(self, frame, info):
+        self.presented_frames += 1
+        self.present_times.append(time.perf_counter())
+        self.current_position = info.pts
+
+    def present_fps(self):
+        times = self.present_times
+        if len(times) < 2 or time.perf_counter() - times[-1] > 1.0:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats_snapshot(self):
+        return {
+            'time': time.time(),
+            'fps': self.present_fps(),
+            'queue_depth': len(self.frame_buffer),
+            'decoded_frames': self.decoded_frames,
+            'presented_frames': self.presented_frames,
+            'dropped_frames': self.dropped_frames,
+            'skipped_frames': self.skipped_frames,
+            'cached_frames': self.cached_frames,
+            'frame_cache': self.frame_cache.stats(),
+            'audio_drift_ms': self.audio.drift_stats() if self.audio is not None else {},
+            'stages': self.stage_stats.snapshot(),
+        }
+
+    def start_stats_dump(self, path, interval=STATS_DUMP_SECONDS):
+        self.stats_dumper = StatsDumper(self.stats_snapshot, path, interval)
+        self.stats_dumper.start()
+
+    def post_ui(self, command, *args):
+        pass
+
+    def audio_speed_supported(self):
+        return AUDIO_MIN_SPEED <= self.speed <= AUDIO_MAX_SPEED
+
+    def start_audio(self):
+        if self.audio is None or self.mosaic_grid is not None:
+            return
+        self.audio.speed = self.speed
+        if not self.audio_speed_supported():
+            self.audio.stop()
+            return
+        paths = [os.path.join(self.folder, video) for video in self.video_files]
+        self.audio.start(paths, self.timeline, self.clock.now(), self.clock.serial)
+
+    def set_speed(self, speed):
+        reversing = (speed < 0) != (self.speed < 0)
+        self.speed = speed
+        self.clock.set_speed(speed)
+        if reversing and self.is_playing() and self.mosaic_grid is None and not self.loop_active():
+            self.stop_playback()
+            self.start_playback()
+            return
+        if self.audio is None:
+            return
+        self.audio.speed = speed
+        if self.is_playing() and self.audio_speed_supported() != (self.audio.serial is not None):
+            self.start_audio()
+
+    def seek(self, position, exact=True):
+        position = min(max(position, 0.0), self.total_duration)
+        with self.seek_lock:
+            self.seek_request = (position, exact)
+            cancel = self.reverse_cancel
+        self.current_position = position
+        if cancel is not None:
+            cancel.set()
+
+    def take_seek_request(self):
+        with self.seek_lock:
+            position, self.seek_request = self.seek_request, None
+        return position
+
+    def shutdown(self):
+        self.stop_flag.set()
+        self.scanner.stop()
+        if self.stats_dumper is not None:
+            self.stats_dumper.stop()
+        if self.audio is not None:
+            self.audio.close()
+        if self.probe_pool is not None:
+            self.probe_pool.shutdown(wait=False, cancel_futures=True)
+        self.keyframe_pool.shutdown(wait=False, cancel_futures=True)
+        self.probe_cache.close()
+        self.frame_cache.close()
+
+
+class VideoPlayer(PlaybackCore, tk.Tk):
+    def __init__(self, folder, probe_workers=PROBE_WORKERS, audio_sink=None, stats_overlay=False):
+        super().__init__()
+        self.title("多视频播放器")
+        self.geometry("800x600")
+
+        self.init_playback(folder, probe_workers, audio_sink)
+        self.render_job = None
+        self.updating_progress = False
+        self.progress_position = None
+        self.dragging_progress = False
+        self.progress_target = None
+        self.preview_job = None
+        self.ui_commands = queue.SimpleQueue()
+        self.show_stats = stats_overlay
+        self.stats_overlay = None
+        self.stats_job = None
 
         self.canvas = self.create_canvas()
+        self.surface = RenderSurface(self.canvas)
         self.progress = self.create_progress_bar()
+        self.loop_bar = self.create_loop_bar()
+        self.preview_photo = ImageTk.PhotoImage('RGB', (THUMB_WIDTH, THUMB_HEIGHT))
+        self.preview_label = self.create_preview_label()
         self.play_button = self.create_play_button()
+        self.loop_buttons = self.create_loop_buttons()
+        self.step_buttons = self.create_step_buttons()
         self.resolution_menu = self.create_resolution_menu()
         self.scale_slider = self.create_scale_slider()
-        self.stop_flag = threading.Event()
-        self.speed = 1.0
+        self.decoder_menu = self.create_decoder_menu()
+        self.interpolation_menu = self.create_interpolation_menu()
+        self.mosaic_menu = self.create_mosaic_menu()
         self.speed_label = self.create_speed_label()
         self.speed_slider = self.create_speed_slider()
+        self.reverse_check = self.create_reverse_check()
+        self.keyframe_check = self.create_keyframe_check()
+        self.snap_check = self.create_snap_check()
+        self.stats_check = self.create_stats_check()
+        self.on_stats_option_change()
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.ui_job = self.after(UI_PUMP_MS, self.pump_ui)
+        self.thumbnails = ThumbnailCache(folder)
+        self.thumbnails.start(os.path.join(folder, video) for video in self.video_files)
+        self.scanner.watch(lambda snapshot: self.post_ui('library', snapshot))
 
-    def get_video_files(self):
-        video_files = [f for f in os.listdir(self.folder) if f.endswith(('mp4', 'avi', 'mkv'))]
-        video_files.sort()
-        return video_files
+    def post_ui(self, command, *args):
+        self.ui_commands.put((command, args))
 
-    def calculate_total_duration(self):
-        total_duration = 0
-        for video in self.video_files:
-            filepath = os.path.join(self.folder, video)
-            probe = ffmpeg.probe(filepath)
-            duration = float(probe['format']['duration'])
-            total_duration += duration
-        return total_duration
+    def pump_ui(self):
+        commands = {}
+        while True:
+            try:
+                command, args = self.ui_commands.get_nowait()
+            except queue.Empty:
+                break
+            commands[command] = args
+        for command, args in commands.items():
+            getattr(self, f'apply_{command}')(*args)
+        if self.probe_pending:
+            self.poll_probe_results()
+        if not self.dragging_progress and self.current_position != self.progress_position:
+            self.update_progress()
+        self.ui_job = self.after(UI_PUMP_MS, self.pump_ui)
+
+    def apply_file(self, video):
+        self.title(f"多视频播放器 - {video}")
+
+    def apply_step(self):
+        if self.is_playing():
+            return
+        frame, info, generation = self.frame_buffer.peek()
+        if frame is not None:
+            self.present_frame(frame, info)
+            self.frame_buffer.release(generation)
+
+    def apply_library(self, snapshot):
+        if self.update_library(snapshot):
+            self.progress.config(to=self.total_duration)
+            self.draw_loop_markers()
+            self.thumbnails.start(os.path.join(self.folder, video) for video in self.video_files)
+
+    def poll_probe_results(self):
+        if self.collect_probe_results():
+            self.progress.config(to=self.total_duration)
+            self.draw_loop_markers()
+        if not self.probe_pending:
+            self.finish_probing()
 
     def create_canvas(self):
         canvas = tk.Canvas(self, width=640, height=480)
@@ -55,14 +2512,41 @@ class VideoPlayer(tk.Tk):
     def create_progress_bar(self):
         progress = ttk.Scale(self, orient='horizontal', length=640, from_=0, to=self.total_duration,
                              command=self.on_progress_change)
+        progress.bind('<ButtonPress-1>', self.on_progress_press)
+        progress.bind('<ButtonRelease-1>', self.on_progress_release)
+        progress.bind('<Motion>', self.on_progress_hover)
+        progress.bind('<Leave>', self.hide_preview)
         progress.pack()
         return progress
 
+    def create_preview_label(self):
+        return tk.Label(self, image=self.preview_photo, bd=1, relief='solid')
+
     def create_play_button(self):
         play_button = tk.Button(self, text="播放", command=self.play_video)
         play_button.pack()
         return play_button
 
+    def create_loop_bar(self):
+        loop_bar = tk.Canvas(self, width=640, height=6, highlightthickness=0)
+        loop_bar.pack()
+        return loop_bar
+
+    def create_loop_buttons(self):
+        frame = tk.Frame(self)
+        for text, command in (("设 A 点", self.set_loop_start), ("设 B 点", self.set_loop_end),
+                              ("清除循环", self.clear_loop)):
+            tk.Button(frame, text=text, command=command).pack(side=tk.LEFT)
+        frame.pack()
+        return frame
+
+    def create_step_buttons(self):
+        frame = tk.Frame(self)
+        for text, direction in (("◀ 上一帧", -1), ("下一帧 ▶", 1)):
+            tk.Button(frame, text=text, command=lambda direction=direction: self.on_step(direction)).pack(side=tk.LEFT)
+        frame.pack()
+        return frame
+
     def create_resolution_menu(self):
         resolution_label = tk.Label(self, text="选择分辨率:")
         resolution_label.pack()
@@ -74,6 +2558,38 @@ class VideoPlayer(tk.Tk):
         resolution_menu.pack()
         return resolution_menu
 
+    def create_decoder_menu(self):
+        decoder_label = tk.Label(self, text="解码后端:")
+        decoder_label.pack()
+
+        decoder_options = [DECODER_OPENCV, DECODER_FFMPEG_PIPE]
+        decoder_var = tk.StringVar(value=self.decoder_backend)
+        decoder_menu = ttk.OptionMenu(self, decoder_var, self.decoder_backend, *decoder_options,
+                                      command=self.change_decoder)
+        decoder_menu.pack()
+        return decoder_menu
+
+    def create_interpolation_menu(self):
+        interpolation_label = tk.Label(self, text="慢放插帧:")
+        interpolation_label.pack()
+
+        interpolation_options = [INTERPOLATION_OFF, INTERPOLATION_BLEND, INTERPOLATION_FLOW]
+        interpolation_var = tk.StringVar(value=self.interpolation_mode)
+        interpolation_menu = ttk.OptionMenu(self, interpolation_var, self.interpolation_mode,
+                                            *interpolation_options, command=self.change_interpolation)
+        interpolation_menu.pack()
+        return interpolation_menu
+
+    def create_mosaic_menu(self):
+        mosaic_label = tk.Label(self, text="拼接布局:")
+        mosaic_label.pack()
+
+        mosaic_options = list(MOSAIC_LAYOUTS)
+        mosaic_var = tk.StringVar(value=MOSAIC_OFF)
+        mosaic_menu = ttk.OptionMenu(self, mosaic_var, MOSAIC_OFF, *mosaic_options, command=self.change_mosaic)
+        mosaic_menu.pack()
+        return mosaic_menu
+
     def create_scale_slider(self):
         scale_slider = ttk.Scale(self, orient='horizontal', length=640, from_=0.1, to=2.0, value=1.0,
                                  command=self.on_scale_change)
@@ -91,94 +2607,234 @@ class VideoPlayer(tk.Tk):
         speed_slider.pack()
         return speed_slider
 
+    def create_reverse_check(self):
+        self.reverse_var = tk.BooleanVar(value=self.speed < 0)
+        reverse_check = tk.Checkbutton(self, text="倒放", variable=self.reverse_var, command=self.on_reverse_change)
+        reverse_check.pack()
+        return reverse_check
+
+    def create_keyframe_check(self):
+        self.keyframe_var = tk.BooleanVar(value=self.use_keyframe_index)
+        keyframe_check = tk.Checkbutton(self, text="关键帧索引", variable=self.keyframe_var,
+                                        command=self.on_keyframe_option_change)
+        keyframe_check.pack()
+        return keyframe_check
+
+    def create_snap_check(self):
+        self.snap_var = tk.BooleanVar(value=self.snap_to_keyframe)
+        snap_check = tk.Checkbutton(self, text="拖动时吸附关键帧", variable=self.snap_var,
+                                    command=self.on_keyframe_option_change)
+        snap_check.pack()
+        return snap_check
+
+    def create_stats_check(self):
+        self.stats_var = tk.BooleanVar(value=self.show_stats)
+        stats_check = tk.Checkbutton(self, text="性能统计", variable=self.stats_var,
+                                     command=self.on_stats_option_change)
+        stats_check.pack()
+        return stats_check
+
+    def on_stats_option_change(self):
+        self.show_stats = self.stats_var.get()
+        if self.stats_job is not None:
+            self.after_cancel(self.stats_job)
+            self.stats_job = None
+        if self.show_stats:
+            self.update_stats_overlay()
+        elif self.stats_overlay is not None:
+            self.canvas.delete(self.stats_overlay)
+            self.stats_overlay = None
+
+    def update_stats_overlay(self):
+        stats = self.stage_stats
+        decode = stats.window('decode', STATS_RECENT_SAMPLES)
+        render = stats.window('present', STATS_RECENT_SAMPLES)
+        text = (f"{self.present_fps():.1f} fps  "
+                f"解码 {decode.mean() if len(decode) else 0:.1f}ms  "
+                f"渲染 {render.mean() if len(render) else 0:.1f}ms  "
+                f"队列 {len(self.frame_buffer)}/{FRAME_BUFFER_CAPACITY}  "
+                f"丢帧 {self.dropped_frames}")
+        drift = self.audio.drift_stats() if self.audio is not None else {}
+        if drift:
+            text += f"  音画偏差 {drift['p50']:.1f}/{drift['max']:.1f}ms"
+        if self.stats_overlay is None:
+            self.stats_overlay = self.canvas.create_text(8, 8, anchor=tk.NW, fill='yellow', font='TkFixedFont')
+        self.canvas.itemconfig(self.stats_overlay, text=text)
+        self.canvas.tag_raise(self.stats_overlay)
+        self.stats_job = self.after(STATS_OVERLAY_MS, self.update_stats_overlay)
+
+    def on_keyframe_option_change(self):
+        self.use_keyframe_index = self.keyframe_var.get()
+        self.snap_to_keyframe = self.use_keyframe_index and self.snap_var.get()
+
     def change_resolution(self, resolution):
         self.resolution = resolution
         width, height = map(int, resolution.split('x'))
         self.canvas.config(width=width, height=height)
+        self.update_geometry()
 
     def on_scale_change(self, value):
         self.scale = float(value)
+        self.update_geometry()
 
-    def play_video(self):
-        self.stop_flag.clear()
-        self.play_button.config(text="停止", command=self.stop_video)
-        threading.Thread(target=self.play).start()
+    def change_decoder(self, backend):
+        self.decoder_backend = backend
+        if self.is_playing():
+            self.seek(self.current_position)
 
-    def stop_video(self):
-        self.stop_flag.set()
-        self.play_button.config(text="播放", command=self.play_video)
+    def change_interpolation(self, mode):
+        self.interpolation_mode = mode
 
-    def play(self):
-        cap = cv2.VideoCapture()
+    def set_loop_start(self):
+        self.set_loop(self.current_position, self.loop_b)
+        self.draw_loop_markers()
 
-        while not self.stop_flag.is_set():
-            video = self.video_files[self.current_video_index]
-            filepath = os.path.join(self.folder, video)
-            cap.open(filepath)
+    def set_loop_end(self):
+        self.set_loop(self.loop_a, self.current_position)
+        self.draw_loop_markers()
 
-            frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    def clear_loop(self):
+        self.set_loop(None, None)
+        self.draw_loop_markers()
 
-            while cap.isOpened() and not self.stop_flag.is_set():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                self.current_position += 1 / (frame_rate * self.speed)
-                self.update_progress()
+    def draw_loop_markers(self):
+        self.loop_bar.delete('all')
+        width = self.progress.winfo_width() or 640
+        if not self.total_duration:
+            return
+        positions = [value for value in (self.loop_a, self.loop_b) if value is not None]
+        xs = [width * value / self.total_duration for value in positions]
+        if len(xs) == 2:
+            self.loop_bar.create_rectangle(xs[0], 0, xs[1], 6, fill='orange', outline='')
+        for x in xs:
+            self.loop_bar.create_line(x, 0, x, 6, fill='red', width=2)
 
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
+    def change_mosaic(self, layout):
+        self.mosaic_grid = MOSAIC_LAYOUTS[layout]
+        if self.mosaic_grid is not None and self.reverse_var.get():
+            self.reverse_var.set(False)
+            self.change_speed(self.speed_slider.get())
+        if self.is_playing():
+            self.stop_playback()
+            self.start_playback()
 
-                width, height = map(int, self.resolution.split('x'))
-                img = img.resize((int(width * self.scale), int(height * self.scale)), Image.ANTIALIAS)
+    def play_video(self):
+        self.start_playback()
+        self.play_button.config(text="停止", command=self.stop_video)
+        self.render_job = self.after(0, self.render_tick)
 
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
-                self.canvas.imgtk = imgtk
+    def stop_video(self):
+        self.stop_playback()
+        if self.render_job is not None:
+            self.after_cancel(self.render_job)
+            self.render_job = None
+        self.play_button.config(text="播放", command=self.play_video)
 
-                self.update_idletasks()
+    def render_tick(self):
+        self.render_job = None
+        if not self.running:
+            return
+        self.render_job = self.after(self.present_due_frame(), self.render_tick)
 
-                delay = int(1000 / (frame_rate * self.speed))
-                self.after(delay)
+    def present_frame(self, frame, info):
+        started = time.perf_counter()
+        self.surface.show(frame)
+        self.stage_stats.record('paste', time.perf_counter() - started)
+        super().present_frame(frame, info)
+        started = time.perf_counter()
+        self.update_idletasks()
+        self.stage_stats.record('blit', time.perf_counter() - started)
 
-                if self.current_position >= self.total_duration:
-                    break
+    def update_progress(self):
+        self.progress_position = self.current_position
+        self.updating_progress = True
+        try:
+            self.progress.set(self.progress_position)
+        finally:
+            self.updating_progress = False
 
-            cap.release()
+    def on_progress_press(self, event):
+        self.dragging_progress = True
 
-            if self.current_video_index < len(self.video_files) - 1:
-                self.current_video_index += 1
-            else:
-                self.current_video_index = 0
-                self.current_position = 0
+    def on_progress_hover(self, event):
+        if not self.dragging_progress:
+            width = max(self.progress.winfo_width(), 1)
+            self.show_preview(min(max(event.x / width, 0.0), 1.0) * self.total_duration)
 
-    def update_progress(self):
-        self.progress.set(self.current_position)
+    def show_preview(self, position):
+        if not self.video_files:
+            return
+        index, offset = self.timeline.locate(position)
+        thumb = self.thumbnails.lookup(os.path.join(self.folder, self.video_files[index]), offset)
+        if thumb is None:
+            self.hide_preview()
+            return
+        self.preview_photo.paste(Image.fromarray(thumb))
+        width = self.progress.winfo_width()
+        x = width * position / self.total_duration if self.total_duration else 0
+        x = min(max(x - THUMB_WIDTH // 2, 0), max(width - THUMB_WIDTH, 0))
+        self.preview_label.place(x=self.progress.winfo_x() + x, y=self.progress.winfo_y() - THUMB_HEIGHT - 6)
+        self.preview_label.lift()
+
+    def hide_preview(self, event=None):
+        if not self.dragging_progress:
+            self.preview_label.place_forget()
 
     def on_progress_change(self, value):
-        new_position = float(value)
-        if new_position < self.current_position:
-            self.current_video_index = 0
-            self.current_position = 0
+        if self.updating_progress:
+            return
+        self.progress_target = float(value)
+        if self.dragging_progress:
+            self.show_preview(self.progress_target)
+        if self.preview_job is None:
+            self.preview_job = self.after(PREVIEW_SEEK_MS, self.preview_seek)
 
-        while new_position > self.current_position + self.video_durations[self.current_video_index]:
-            self.current_position += self.video_durations[self.current_video_index]
-            self.current_video_index += 1
+    def preview_seek(self):
+        self.preview_job = None
+        if self.dragging_progress:
+            self.seek(self.progress_target, exact=not self.snap_to_keyframe)
+        else:
+            self.seek(self.progress_target)
+            self.progress_target = None
 
-        self.current_position = new_position
+    def on_progress_release(self, event):
+        self.dragging_progress = False
+        self.hide_preview()
+        if self.preview_job is not None:
+            self.after_cancel(self.preview_job)
+            self.preview_job = None
+        if self.progress_target is not None:
+            self.seek(self.progress_target)
+            self.progress_target = None
 
     def on_closing(self):
-        self.stop_flag.set()
+        self.after_cancel(self.ui_job)
+        self.thumbnails.stop()
+        self.shutdown()
         self.destroy()
 
     def change_speed(self, speed):
-        self.speed = float(speed)
+        speed = float(speed)
+        self.set_speed(-speed if self.reverse_var.get() else speed)
         self.speed_label.config(text=f"播放速度: {self.speed}x")
 
+    def on_reverse_change(self):
+        if self.mosaic_grid is not None:
+            self.reverse_var.set(False)
+        self.change_speed(self.speed_slider.get())
+
+    def on_step(self, direction):
+        if self.mosaic_grid is not None:
+            return
+        if self.is_playing():
+            self.stop_video()
+        self.request_step(direction)
+
 
 class SkinVideoPlayer(VideoPlayer):
-    def __init__(self, folder, skin):
-        super().__init__(folder)
+    def __init__(self, folder, skin, **kwargs):
         self.skin = skin
+        super().__init__(folder, **kwargs)
 
     def create_canvas(self):
         canvas = self.skin.create_canvas(self, width=640, height=480)
@@ -188,14 +2844,42 @@ class SkinVideoPlayer(VideoPlayer):
     def create_progress_bar(self):
         progress = self.skin.create_progress_bar(self, orient='horizontal', length=640, from_=0,
                                                  to=self.total_duration, command=self.on_progress_change)
+        progress.bind('<ButtonPress-1>', self.on_progress_press)
+        progress.bind('<ButtonRelease-1>', self.on_progress_release)
+        progress.bind('<Motion>', self.on_progress_hover)
+        progress.bind('<Leave>', self.hide_preview)
         progress.pack()
         return progress
 
+    def create_preview_label(self):
+        return self.skin.create_label(self, image=self.preview_photo, bd=1, relief='solid')
+
     def create_play_button(self):
         play_button = self.skin.create_play_button(self, text="播放", command=self.play_video)
         play_button.pack()
         return play_button
 
+    def create_loop_bar(self):
+        loop_bar = self.skin.create_canvas(self, width=640, height=6, highlightthickness=0)
+        loop_bar.pack()
+        return loop_bar
+
+    def create_loop_buttons(self):
+        frame = tk.Frame(self)
+        for text, command in (("设 A 点", self.set_loop_start), ("设 B 点", self.set_loop_end),
+                              ("清除循环", self.clear_loop)):
+            self.skin.create_button(frame, text=text, command=command).pack(side=tk.LEFT)
+        frame.pack()
+        return frame
+
+    def create_step_buttons(self):
+        frame = tk.Frame(self)
+        for text, direction in (("◀ 上一帧", -1), ("下一帧 ▶", 1)):
+            self.skin.create_button(frame, text=text,
+                                    command=lambda direction=direction: self.on_step(direction)).pack(side=tk.LEFT)
+        frame.pack()
+        return frame
+
     def create_resolution_menu(self):
         resolution_label = self.skin.create_label(self, text="选择分辨率:")
         resolution_label.pack()
@@ -207,6 +2891,39 @@ class SkinVideoPlayer(VideoPlayer):
         resolution_menu.pack()
         return resolution_menu
 
+    def create_decoder_menu(self):
+        decoder_label = self.skin.create_label(self, text="解码后端:")
+        decoder_label.pack()
+
+        decoder_options = [DECODER_OPENCV, DECODER_FFMPEG_PIPE]
+        decoder_var = tk.StringVar(value=self.decoder_backend)
+        decoder_menu = self.skin.create_option_menu(self, decoder_var, self.decoder_backend,
+                                                    *decoder_options, command=self.change_decoder)
+        decoder_menu.pack()
+        return decoder_menu
+
+    def create_interpolation_menu(self):
+        interpolation_label = self.skin.create_label(self, text="慢放插帧:")
+        interpolation_label.pack()
+
+        interpolation_options = [INTERPOLATION_OFF, INTERPOLATION_BLEND, INTERPOLATION_FLOW]
+        interpolation_var = tk.StringVar(value=self.interpolation_mode)
+        interpolation_menu = self.skin.create_option_menu(self, interpolation_var, self.interpolation_mode,
+                                                          *interpolation_options, command=self.change_interpolation)
+        interpolation_menu.pack()
+        return interpolation_menu
+
+    def create_mosaic_menu(self):
+        mosaic_label = self.skin.create_label(self, text="拼接布局:")
+        mosaic_label.pack()
+
+        mosaic_options = list(MOSAIC_LAYOUTS)
+        mosaic_var = tk.StringVar(value=MOSAIC_OFF)
+        mosaic_menu = self.skin.create_option_menu(self, mosaic_var, MOSAIC_OFF, *mosaic_options,
+                                                   command=self.change_mosaic)
+        mosaic_menu.pack()
+        return mosaic_menu
+
     def create_scale_slider(self):
         scale_slider = self.skin.create_scale_slider(self, orient='horizontal', length=640, from_=0.1, to=2.0,
                                                      value=1.0, command=self.on_scale_change)
@@ -224,6 +2941,34 @@ class SkinVideoPlayer(VideoPlayer):
         speed_slider.pack()
         return speed_slider
 
+    def create_reverse_check(self):
+        self.reverse_var = tk.BooleanVar(value=self.speed < 0)
+        reverse_check = self.skin.create_check_button(self, text="倒放", variable=self.reverse_var,
+                                                      command=self.on_reverse_change)
+        reverse_check.pack()
+        return reverse_check
+
+    def create_keyframe_check(self):
+        self.keyframe_var = tk.BooleanVar(value=self.use_keyframe_index)
+        keyframe_check = self.skin.create_check_button(self, text="关键帧索引", variable=self.keyframe_var,
+                                                       command=self.on_keyframe_option_change)
+        keyframe_check.pack()
+        return keyframe_check
+
+    def create_snap_check(self):
+        self.snap_var = tk.BooleanVar(value=self.snap_to_keyframe)
+        snap_check = self.skin.create_check_button(self, text="拖动时吸附关键帧", variable=self.snap_var,
+                                                   command=self.on_keyframe_option_change)
+        snap_check.pack()
+        return snap_check
+
+    def create_stats_check(self):
+        self.stats_var = tk.BooleanVar(value=self.show_stats)
+        stats_check = self.skin.create_check_button(self, text="性能统计", variable=self.stats_var,
+                                                    command=self.on_stats_option_change)
+        stats_check.pack()
+        return stats_check
+
 
 class Skin:
     def create_canvas(self, master, **kwargs):
@@ -235,11 +2980,14 @@ class Skin:
     def create_play_button(self, master, **kwargs):
         return tk.Button(master, **kwargs)
 
+    def create_button(self, master, **kwargs):
+        return tk.Button(master, **kwargs)
+
     def create_label(self, master, **kwargs):
         return tk.Label(master, **kwargs)
 
-    def create_option_menu(self, master, **kwargs):
-        return ttk.OptionMenu(master, **kwargs)
+    def create_option_menu(self, master, *args, **kwargs):
+        return ttk.OptionMenu(master, *args, **kwargs)
 
     def create_scale_slider(self, master, **kwargs):
         return ttk.Scale(master, **kwargs)
@@ -247,12 +2995,354 @@ class Skin:
     def create_speed_slider(self, master, **kwargs):
         return ttk.Scale(master, **kwargs)
 
+    def create_check_button(self, master, **kwargs):
+        return tk.Checkbutton(master, **kwargs)
 
-if __name__ == "__main__":
+
+class HeadlessPlayer(PlaybackCore):
+    """
+    无界面播放器：驱动同一条 解码 → 转换/缩放 → 展示 流水线，展示阶段只把帧拷贝到空输出。
+    用于基准测试和没有显示器的环境，播放完一遍列表后结束。
+    """
+
+    def __init__(self, folder, resolution="640x480", scale=1.0, backend=DECODER_OPENCV, speed=1.0,
+                 probe_workers=PROBE_WORKERS, audio=False, probe_cache_path=None, mosaic=MOSAIC_OFF):
+        self.init_playback(folder, probe_workers, NullAudioSink(), audio, probe_cache_path)
+        self.resolution = resolution
+        self.scale = scale
+        self.decoder_backend = backend
+        self.mosaic_grid = MOSAIC_LAYOUTS[mosaic]
+        self.update_geometry()
+        self.loop_playlist = False
+        self.sink_frame = None
+        self.seek_timeouts = 0
+        self.set_speed(speed)
+        self.wait_for_probes()
+
+    def wait_for_probes(self):
+        while self.probe_pending:
+            time.sleep(0.01)
+            self.collect_probe_results()
+        self.finish_probing()
+
+    def present_frame(self, frame, info):
+        if self.sink_frame is None or self.sink_frame.shape != frame.shape:
+            self.sink_frame = np.empty_like(frame)
+        np.copyto(self.sink_frame, frame)
+        super().present_frame(frame, info)
+
+    def run(self, seconds=None, unpaced=False):
+        if self.speed < 0 and self.current_position == 0:
+            self.seek(self.total_duration)
+        started = time.perf_counter()
+        self.start_playback()
+        while seconds is None or time.perf_counter() - started < seconds:
+            if self.finished and len(self.frame_buffer) == 0:
+                break
+            if not unpaced:
+                time.sleep(self.present_due_frame() / 1000)
+                continue
+            frame, info, generation = self.frame_buffer.peek()
+            if frame is None:
+                time.sleep(0.001)
+                continue
+            presented = time.perf_counter()
+            self.present_frame(frame, info)
+            self.stage_stats.record('present', time.perf_counter() - presented)
+            self.frame_buffer.release(generation)
+        elapsed = time.perf_counter() - started
+        self.stop_playback()
+        self.decoder_thread.join()
+        self.shutdown()
+        return self.report(elapsed, unpaced)
+
+    def measure_seeks(self, count, seed=0):
+        rng = random.Random(seed)
+        self.loop_playlist = True
+        self.start_playback()
+        latencies = []
+        self.seek_timeouts = 0
+        last_frame = self.total_duration - 1 / ((self.video_info[-1] or {}).get('fps') or 25.0)
+        for _ in range(count):
+            previous = self.seek_serial
+            started = time.perf_counter()
+            self.seek(rng.uniform(0.0, max(last_frame - 0.5, 0.0)))
+            while time.perf_counter() - started < SEEK_TIMEOUT_SECONDS:
+                frame, info, generation = self.frame_buffer.peek()
+                if frame is None:
+                    time.sleep(0.0005)
+                    continue
+                self.frame_buffer.release(generation)
+                if self.seek_serial != previous and info.serial == self.seek_serial:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    break
+            else:
+                self.seek_timeouts += 1
+        self.stop_playback()
+        self.decoder_thread.join()
+        self.shutdown()
+        latencies = np.array(latencies)
+        return {f'p{point}': float(np.percentile(latencies, point)) for point in (50, 90, 99)} if len(latencies) else {}
+
+    def report(self, elapsed, unpaced):
+        return {
+            'folder': self.folder,
+            'files': len(self.video_files),
+            'backend': self.decoder_backend,
+            'output': f"{self.output_shape[1]}x{self.output_shape[0]}",
+            'speed': self.speed,
+            'unpaced': unpaced,
+            'elapsed': elapsed,
+            'decoded_frames': self.decoded_frames,
+            'presented_frames': self.presented_frames,
+            'dropped_frames': self.dropped_frames,
+            'skipped_frames': self.skipped_frames,
+            'cached_frames': self.cached_frames,
+            'frame_cache': self.frame_cache.stats(),
+            'decode_fps': self.decoded_frames / elapsed if elapsed else 0.0,
+            'present_fps': self.presented_frames / elapsed if elapsed else 0.0,
+            'boundary_gap_ms': max(self.boundary_gaps, default=0.0),
+            'audio_drift_ms': self.audio.drift_stats() if self.audio is not None else {},
+            'stages_ms': self.stage_stats.summary(),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def print_report(report):
+    print(f"文件: {report['files']}  后端: {report['backend']}  输出: {report['output']}  "
+          f"倍速: {report['speed']}  用时: {report['elapsed']:.2f}s")
+    print(f"解码 {report['decoded_frames']} 帧 ({report['decode_fps']:.1f} fps)  "
+          f"展示 {report['presented_frames']} 帧 ({report['present_fps']:.1f} fps)  "
+          f"丢帧 {report['dropped_frames']}  跳帧 {report['skipped_frames']}  缓存回放 {report['cached_frames']} 帧")
+    cache = report['frame_cache']
+    print(f"帧缓存: 内存 {cache['ram_frames']} 帧  磁盘 {cache['spill_frames']} 帧  命中 {cache['hits']}/"
+          f"{cache['spill_hits']}  未命中 {cache['misses']}  溢出 {cache['spilled']}  淘汰 {cache['evicted']}")
+    drift = report['audio_drift_ms']
+    if drift:
+        print(f"音画偏差: p50 {drift['p50']:.1f}ms  最大 {drift['max']:.1f}ms")
+    for stage, points in report['stages_ms'].items():
+        print(f"  {stage:<8} " + "  ".join(f"{name} {value:.2f}ms" for name, value in points.items()))
+    if report['peak_rss_mb'] is not None:
+        print(f"峰值内存: {report['peak_rss_mb']:.1f} MB")
+
+
+CORPUS_SETS = {
+    'tiny': [dict(count=200, duration=1, size='320x240', fps=30, audio='alternate')],
+    'long': [dict(count=2, duration=600, size='640x360', fps=30, audio=True)],
+    'mixed_fps': [dict(count=1, duration=10, size='1280x720', fps=fps, audio=True)
+                  for fps in ('24000/1001', 24, 25, '30000/1001', 50, 60)],
+    'uhd': [dict(count=2, duration=10, size='3840x2160', fps=30, audio=False)],
+    'vfr': [dict(count=3, duration=10, size='1280x720', fps=60, audio=True, vfr=True)],
+    'no_audio': [dict(count=4, duration=10, size='1280x720', fps=30, audio=False)],
+}
+
+
+def generate_corpus(output, quick=False, codec='libx264', gop=250):
+    """
+    用 ffmpeg 的 testsrc/sine 生成合成测试视频，已存在的文件跳过。quick 模式缩短时长、减少数量，适合 CI。
+    """
+    for name, specs in CORPUS_SETS.items():
+        folder = os.path.join(output, name)
+        os.makedirs(folder, exist_ok=True)
+        number = 0
+        for spec in specs:
+            count = max(1, spec['count'] // 10) if quick else spec['count']
+            duration = min(spec['duration'], 5) if quick else spec['duration']
+            for _ in range(count):
+                with_audio = number % 2 == 0 if spec['audio'] == 'alternate' else spec['audio']
+                filepath = os.path.join(folder, f"{name}_{number:04d}.mp4")
+                number += 1
+                if os.path.exists(filepath):
+                    continue
+                video = ffmpeg.input(f"testsrc=size={spec['size']}:rate={spec['fps']}:duration={duration}", f='lavfi')
+                options = dict(vcodec=codec, pix_fmt='yuv420p', g=gop, loglevel='error')
+                if spec.get('vfr'):
+                    video = video.filter('select', 'not(mod(n,3))+lt(mod(n,7),2)')
+                    options['vsync'] = 'vfr'
+                streams = [video]
+                if with_audio:
+                    streams.append(ffmpeg.input(f"sine=frequency=440:sample_rate=48000:duration={duration}", f='lavfi'))
+                    options['acodec'] = 'aac'
+                ffmpeg.output(*streams, filepath, **options).overwrite_output().run()
+                print(filepath, file=sys.stderr)
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(corpus, seconds=None, seeks=50, backend=DECODER_OPENCV):
+    """
+    对语料库的每个子目录依次测量：冷/热探测、无节奏的完整播放、随机跳转延迟。
+    """
+    results = {
+        'commit': current_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'opencv': cv2.__version__,
+        'backend': backend,
+        'sets': {},
+    }
+    for name in sorted(os.listdir(corpus)):
+        folder = os.path.join(corpus, name)
+        if not os.path.isdir(folder):
+            continue
+        print(f"== {name}", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'probe.sqlite')
+            started = time.perf_counter()
+            player = HeadlessPlayer(folder, backend=backend, audio=False, probe_cache_path=cache_path)
+            cold = time.perf_counter() - started
+            player.shutdown()
+            started = time.perf_counter()
+            player = HeadlessPlayer(folder, backend=backend, audio=False, probe_cache_path=cache_path)
+            warm = time.perf_counter() - started
+            files = len(player.video_files)
+            playback = player.run(seconds, unpaced=True)
+            seeker = HeadlessPlayer(folder, backend=backend, audio=False, probe_cache_path=cache_path)
+            seek = seeker.measure_seeks(seeks)
+        results['sets'][name] = {
+            'files': files,
+            'probe_cold_s': cold,
+            'probe_cold_files_per_s': files / cold if cold else 0.0,
+            'probe_warm_s': warm,
+            'playback': playback,
+            'seek_ms': seek,
+            'seek_timeouts': seeker.seek_timeouts,
+        }
+    return results
+
+
+SUITE_METRICS = [
+    ('probe_cold_files_per_s', lambda r: r['probe_cold_files_per_s'], True),
+    ('probe_warm_s', lambda r: r['probe_warm_s'], False),
+    ('decode_fps', lambda r: r['playback']['decode_fps'], True),
+    ('peak_rss_mb', lambda r: r['playback']['peak_rss_mb'], False),
+    ('seek_p50_ms', lambda r: r['seek_ms'].get('p50'), False),
+    ('seek_p99_ms', lambda r: r['seek_ms'].get('p99'), False),
+]
+
+
+def compare_results(baseline, current):
+    for name, result in current['sets'].items():
+        base = baseline['sets'].get(name)
+        if base is None:
+            continue
+        print(f"== {name}")
+        for metric, get, higher_is_better in SUITE_METRICS:
+            old, new = get(base), get(result)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if higher_is_better else change < 0
+            verdict = '=' if change == 0 else ('↑' if better else '↓')
+            print(f"  {metric:<24} {old:>10.2f} -> {new:>10.2f}  {change:+6.1f}% {verdict}")
+
+
+def run_gui(stats_overlay=False, stats_dump=None, stats_interval=STATS_DUMP_SECONDS, frame_cache=None):
     root = tk.Tk()
     root.withdraw()
     folder_path = filedialog.askdirectory(title="选择包含视频的文件夹")
     root.destroy()
     if folder_path:
-        player = SkinVideoPlayer(folder_path, Skin())
+        player = SkinVideoPlayer(folder_path, Skin(), stats_overlay=stats_overlay)
+        if frame_cache is not None:
+            player.frame_cache = frame_cache
+        if stats_dump:
+            player.start_stats_dump(stats_dump, stats_interval)
         player.mainloop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多视频播放器")
+    parser.add_argument('--stats-overlay', action='store_true', help="在画面上显示性能统计")
+    parser.add_argument('--stats-dump', help="定期把性能统计追加到文件（.csv 或 JSON Lines）")
+    parser.add_argument('--stats-interval', type=float, default=STATS_DUMP_SECONDS, help="统计写入间隔（秒）")
+    parser.add_argument('--frame-cache-mb', type=int, default=FRAME_CACHE_RAM_MB, help="解码帧缓存的内存预算，0 表示关闭")
+    parser.add_argument('--frame-spill-mb', type=int, default=FRAME_CACHE_SPILL_MB, help="解码帧缓存溢出到磁盘的预算，默认 0 不溢出")
+    parser.add_argument('--frame-spill-dir', help="溢出文件所在目录，默认用户缓存目录")
+    commands = parser.add_subparsers(dest='command')
+    bench = commands.add_parser('bench', help="无界面播放基准测试")
+    bench.add_argument('folder')
+    bench.add_argument('--seconds', type=float, default=None, help="最长运行时间，默认播放完整个列表")
+    bench.add_argument('--speed', type=float, default=1.0)
+    bench.add_argument('--unpaced', action='store_true', help="不按时钟节奏，尽可能快地解码和展示")
+    bench.add_argument('--resolution', default="640x480")
+    bench.add_argument('--scale', type=float, default=1.0)
+    bench.add_argument('--backend', choices=[DECODER_OPENCV, DECODER_FFMPEG_PIPE], default=DECODER_OPENCV)
+    bench.add_argument('--audio', action='store_true', help="同时运行音频引擎（空输出）")
+    bench.add_argument('--mosaic', choices=list(MOSAIC_LAYOUTS), default=MOSAIC_OFF, help="拼接布局")
+    bench.add_argument('--loop', type=float, nargs=2, metavar=('A', 'B'), help="A/B 循环区间（秒），需要同时指定 --seconds")
+    bench.add_argument('--json', help="把结果写入 JSON 文件，- 表示标准输出")
+    corpus = commands.add_parser('corpus', help="生成合成测试视频")
+    corpus.add_argument('output')
+    corpus.add_argument('--quick', action='store_true', help="生成缩小版语料，适合 CI")
+    corpus.add_argument('--codec', default='libx264')
+    suite = commands.add_parser('suite', help="在合成语料上运行探测、播放和跳转基准")
+    suite.add_argument('corpus')
+    suite.add_argument('--seconds', type=float, default=None, help="每组播放的最长时间")
+    suite.add_argument('--seeks', type=int, default=50)
+    suite.add_argument('--backend', choices=[DECODER_OPENCV, DECODER_FFMPEG_PIPE], default=DECODER_OPENCV)
+    suite.add_argument('--json', required=True, help="结果 JSON 文件")
+    suite.add_argument('--compare', help="与之前的结果 JSON 对比")
+    compare = commands.add_parser('compare', help="对比两次基准结果")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    args = parser.parse_args(argv)
+
+    if args.command == 'corpus':
+        generate_corpus(args.output, args.quick, args.codec)
+        return
+    if args.command in ('suite', 'compare'):
+        if args.command == 'suite':
+            results = run_suite(args.corpus, args.seconds, args.seeks, args.backend)
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            baseline_path = args.compare
+        else:
+            with open(args.current, encoding='utf-8') as f:
+                results = json.load(f)
+            baseline_path = args.baseline
+        if baseline_path:
+            with open(baseline_path, encoding='utf-8') as f:
+                compare_results(json.load(f), results)
+        return
+    frame_cache = FrameCache(args.frame_cache_mb << 20, args.frame_spill_mb << 20, args.frame_spill_dir)
+    if args.command != 'bench':
+        run_gui(args.stats_overlay, args.stats_dump, args.stats_interval, frame_cache)
+        return
+
+    player = HeadlessPlayer(args.folder, args.resolution, args.scale, args.backend, args.speed, audio=args.audio,
+                            mosaic=args.mosaic)
+    player.frame_cache = frame_cache
+    if args.loop:
+        if args.seconds is None:
+            parser.error("--loop 需要同时指定 --seconds")
+        player.set_loop(*args.loop)
+    if args.stats_dump:
+        player.start_stats_dump(args.stats_dump, args.stats_interval)
+    report = player.run(args.seconds, args.unpaced)
+    if args.json == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()